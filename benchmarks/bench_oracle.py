@@ -0,0 +1,231 @@
+import argparse
+import datetime as dt
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+# Benchmarks for the oracle pipeline on synthetic tomorrow.io payloads.
+#
+#   python benchmarks/bench_oracle.py                    # quick matrix, print a report
+#   python benchmarks/bench_oracle.py --full             # horizon x resolution x locations x thresholds
+#   python benchmarks/bench_oracle.py --save-baseline    # store results as the baseline
+#   python benchmarks/bench_oracle.py --compare          # exit 1 if any stage regressed past --tolerance
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+HORIZONS_DAYS = [5, 7, 14]
+RESOLUTIONS = ["1h", "15m", "1m"]
+LOCATION_COUNTS = [1, 10, 100, 1000]
+THRESHOLD_SWEEPS = [1, 10, 100]
+
+QUICK_HORIZONS_DAYS = [5, 14]
+QUICK_RESOLUTIONS = ["1h", "15m"]
+QUICK_LOCATION_COUNTS = [1, 10, 100]
+QUICK_THRESHOLD_SWEEPS = [1, 25]
+
+
+def load_page():
+    # Only the metrics strip needs the Streamlit page. Importing it in bare mode renders
+    # nothing; silence Streamlit's warnings about that.
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    import weather_golf_oracle
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+    return weather_golf_oracle
+
+
+def synthetic_payload(location, horizon_days, resolution):
+    from tomorrowio_stub import generate_timelines
+    start_time = dt.datetime(2024, 6, 1, 12, tzinfo=dt.timezone.utc)
+    return generate_timelines(location, start_time, start_time + dt.timedelta(days=horizon_days), ["1d", resolution])
+
+
+def synthetic_columns(location, horizon_days, resolution):
+    from oracle_core import FORECAST_FIELDS
+    from timeline_parser import columns_from_payload
+    return columns_from_payload(synthetic_payload(location, horizon_days, resolution), FORECAST_FIELDS)
+
+
+def threshold_sweep(count):
+    # Evenly spread (min_temp, max_wind, max_rain) triples around the sidebar defaults
+    if count == 1:
+        return [(50, 15, 20)]
+    return [(40 + 30 * i / (count - 1), 5 + 20 * ((i * 7) % count) / count, 50 * ((i * 3) % count) / count)
+            for i in range(count)]
+
+
+def measure(function, repeat):
+    # Best wall time over `repeat` runs, then one extra traced run for peak memory
+    timings = []
+    result = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"best_s": min(timings), "median_s": statistics.median(timings), "peak_bytes": peak}, result
+
+
+def stage_cases(oracle, page, horizon_days, resolution, sweeps, repeat):
+    results = {}
+    case = f"{horizon_days}d-{resolution}"
+    from timeline_parser import parse_timelines
+    body = json.dumps(synthetic_payload("Denver", horizon_days, resolution)).encode("utf-8")
+    results[f"stream_parse[{case}]"], payload = measure(
+        lambda: parse_timelines(body, oracle.FORECAST_FIELDS), repeat)
+    daily, hourly = payload["1d"], payload[resolution]
+
+    results[f"parse[{case}]"], forecast_df = measure(lambda: oracle.forecast_frame(hourly), repeat)
+    results[f"daylight_filter[{case}]"], filtered = measure(
+        lambda: oracle.filter_forecast_by_sunrise_sunset(forecast_df, oracle.daylight_index(daily)), repeat)
+
+    mask = oracle.golfable_mask(filtered, 50, 15, 20)
+    results[f"window_detection[{case}]"], windows = measure(lambda: oracle.golfable_windows(filtered, mask), repeat)
+    results[f"golfable_hrs_each_day[{case}]"], golfable_hours = measure(
+        lambda: oracle.golfable_hrs_each_day(filtered, 50, 15, 20, windows), repeat)
+
+    results[f"tee_windows[{case}]"], _ = measure(lambda: oracle.top_tee_windows(filtered, 50, 15, 20), repeat)
+
+    forecast = oracle.parse_forecast("Denver", payload)
+
+    def build_views():
+        # Cold path: every day's view model and figure built from scratch
+        forecast.pop("day_views", None)
+        oracle.clear_figure_cache()
+        oracle.clear_day_view_cache()
+        day_views = oracle.build_day_views(forecast, 50, 15, 20)
+        for day_view in day_views["days"].values():
+            oracle.day_figure(day_view)
+        return day_views
+
+    results[f"graph_forecast_w_highlight[{case}]"], day_views = measure(build_views, repeat)
+
+    select_date = next(iter(day_views["days"]))
+    results[f"week_day_metrics[{case}]"], _ = measure(
+        lambda: page.week_day_metrics(day_views["week_strip"], select_date), repeat)
+
+    for count in sweeps:
+        thresholds = threshold_sweep(count)
+
+        def sweep():
+            index = oracle.ThresholdIndex(filtered)
+            return [oracle.golfable_hours_per_day(filtered, index.windows(*t)) for t in thresholds]
+
+        results[f"threshold_sweep_x{count}[{case}]"], _ = measure(sweep, repeat)
+
+    return results
+
+
+def location_cases(oracle, location_counts, repeat):
+    results = {}
+    largest = max(location_counts)
+    payloads = [synthetic_columns(f"Course {i}", 5, "1h") for i in range(largest)]
+
+    for count in location_counts:
+        def pipeline():
+            totals = []
+            for payload in payloads[:count]:
+                daily, hourly = payload["1d"], payload["1h"]
+                filtered = oracle.filter_forecast_by_sunrise_sunset(oracle.forecast_frame(hourly), oracle.daylight_index(daily))
+                totals.append(oracle.golfable_hrs_each_day(filtered, 50, 15, 20))
+            return totals
+
+        results[f"locations_x{count}[5d-1h]"], _ = measure(pipeline, repeat)
+
+    return results
+
+
+def run(full, repeat):
+    import oracle_core as oracle
+    page = load_page()
+
+    horizons = HORIZONS_DAYS if full else QUICK_HORIZONS_DAYS
+    resolutions = RESOLUTIONS if full else QUICK_RESOLUTIONS
+    location_counts = LOCATION_COUNTS if full else QUICK_LOCATION_COUNTS
+    sweeps = THRESHOLD_SWEEPS if full else QUICK_THRESHOLD_SWEEPS
+
+    results = {}
+    for horizon_days in horizons:
+        for resolution in resolutions:
+            print(f"... {horizon_days}d at {resolution}", file=sys.stderr)
+            results.update(stage_cases(oracle, page, horizon_days, resolution, sweeps, repeat))
+
+    print(f"... {max(location_counts)} locations", file=sys.stderr)
+    results.update(location_cases(oracle, location_counts, repeat))
+    return results
+
+
+def print_report(results, baseline=None, tolerance=0.25):
+    regressions = []
+    print(f"{'stage':<48} {'best ms':>10} {'median ms':>10} {'peak MiB':>9} {'vs base':>9}")
+    for name, result in results.items():
+        change = ""
+        previous = (baseline or {}).get(name)
+        if previous:
+            ratio = result["best_s"] / previous["best_s"] - 1
+            change = f"{ratio:+.0%}"
+            if ratio > tolerance:
+                regressions.append((name, ratio))
+                change += " !"
+        print(f"{name:<48} {result['best_s'] * 1000:>10.2f} {result['median_s'] * 1000:>10.2f} "
+              f"{result['peak_bytes'] / 2 ** 20:>9.2f} {change:>9}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Golf-able Oracle pipeline")
+    parser.add_argument("--full", action="store_true", help="Run the full scaling matrix (slow)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per stage; the best is reported")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="Fail when a stage is slower than the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a regression")
+    args = parser.parse_args()
+
+    results = run(args.full, args.repeat)
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+    regressions = print_report(results, baseline, args.tolerance)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": dt.datetime.now(dt.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.compare:
+        if baseline is None:
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            sys.exit(2)
+        for name, ratio in regressions:
+            print(f"REGRESSION {name}: {ratio:+.0%} slower than baseline")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+import argparse
+import asyncio
+import csv
+import datetime as dt
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+import numpy as np
+
+# Concurrent-session load test for the Streamlit app against the local tomorrow.io stub.
+#
+#   python benchmarks/load_oracle.py                                  # 1, 5, 10 and 25 sessions
+#   python benchmarks/load_oracle.py --sessions 1 25 50 100 --think-time 0
+#   python benchmarks/load_oracle.py --output load.json               # also write the results as JSON
+#
+# Each level starts a fresh `streamlit run weather_golf_oracle.py` (headless, empty cache directory)
+# pointed at a stub served from this process, and connects N simulated browsers to it at once. Every
+# session loads the page, consults the oracle for a course (a few popular courses draw most sessions),
+# switches days, edits the temperature and wind thresholds and switches day again. AppTest cannot run
+# sessions concurrently (every run swaps a process-wide mock runtime), so sessions speak Streamlit's
+# websocket protocol to a real server instead. A rerun's latency runs from sending it until the
+# server reports the script finished. Reported per level: rerun latency percentiles, tomorrow.io
+# calls per session and the server's resident memory with every session still connected.
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+APP_PATH = os.path.join(REPO_ROOT, "weather_golf_oracle.py")
+GAZETTEER_PATH = os.path.join(REPO_ROOT, "gazetteer.csv")
+
+DEFAULT_SESSIONS = [1, 5, 10, 25]
+
+# Labels of the widgets the sessions drive
+CITY_LABEL = "Example: Denver"
+MIN_TEMP_LABEL = "°F"
+MAX_WIND_LABEL = "Mph"
+ORACLE_LABEL = "Consult the Golf-able Oracle"
+DAY_BUTTON_PREFIX = "🌤️"
+
+WIDGET_TYPES = {"button", "checkbox", "number_input", "text_area", "text_input"}
+
+SERVER_START_TIMEOUT_SECONDS = 60
+MAX_MESSAGE_BYTES = 200 * 2 ** 20
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def process_memory(pid):
+    # (resident, peak resident) bytes of a process; None where /proc is not available
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            fields = dict(line.split(":", 1) for line in f if ":" in line)
+    except OSError:
+        return None, None
+    return tuple(int(fields[name].split()[0]) * 1024 if name in fields else None for name in ("VmRSS", "VmHWM"))
+
+
+def course_names(count):
+    # The gazetteer's first `count` places, "Name, ST", most populous first
+    with open(GAZETTEER_PATH, encoding="utf-8", newline="") as f:
+        rows = sorted(csv.DictReader(f), key=lambda row: -int(row["population"] or 0))
+    return [f"{row['name']}, {row['admin']}" if row["admin"] else row["name"] for row in rows[:count]]
+
+
+class Server:
+    # `streamlit run` of the app in its own working directory, so every level starts with empty caches
+    def __init__(self, stub_url):
+        self.workdir = tempfile.mkdtemp(prefix="oracle-load-")
+        self.port = free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        env = dict(os.environ, TOMORROWIO_BASE_URL=stub_url,
+                   TOMORROWIO_API_KEY=os.environ.get("TOMORROWIO_API_KEY", "load-test"))
+        self.log = open(os.path.join(self.workdir, "streamlit.log"), "wb")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "streamlit", "run", APP_PATH, "--server.headless=true",
+             f"--server.port={self.port}", "--server.address=127.0.0.1", "--server.fileWatcherType=none",
+             "--browser.gatherUsageStats=false", "--global.developmentMode=false"],
+            cwd=self.workdir, env=env, stdout=self.log, stderr=subprocess.STDOUT)
+
+    def wait_until_healthy(self):
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            try:
+                with urllib.request.urlopen(f"{self.url}/_stcore/health", timeout=1) as response:
+                    if response.status == 200:
+                        return
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        with open(self.log.name, encoding="utf-8", errors="replace") as f:
+            raise RuntimeError(f"Streamlit did not start:\n{f.read()[-2000:]}")
+
+    def memory(self):
+        return process_memory(self.process.pid)
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+class Session:
+    # One simulated browser tab: sends reruns with its widget states, reads deltas until the run ends
+    def __init__(self, server_url, timeout):
+        self.server_url = server_url
+        self.timeout = timeout
+        self.connection = None
+
+        # (widget type, label) -> (widget id, fragment id) as last rendered, in the order first rendered
+        self.widgets = {}
+        # widget id -> WidgetState holding the value this session has set
+        self.values = {}
+        # message hash -> ForwardMsg, so cached-message references can be resolved like the browser does
+        self.messages = {}
+
+        # (action, seconds) per rerun
+        self.latencies = []
+        self.errors = []
+        # Forecast charts rendered, to tell a consultation from an empty page
+        self.charts = 0
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+        ws_url = self.server_url.replace("http://", "ws://") + "/_stcore/stream"
+        self.connection = await websocket_connect(ws_url, subprotocols=["streamlit"],
+                                                  max_message_size=MAX_MESSAGE_BYTES)
+        await self.rerun("load")
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    def find(self, kind, label):
+        for (widget_kind, widget_label), widget in self.widgets.items():
+            if widget_kind == kind and label in widget_label:
+                return widget
+        raise LookupError(f"No {kind} labelled {label!r} rendered")
+
+    def day_buttons(self):
+        return [widget for (kind, label), widget in self.widgets.items()
+                if kind == "button" and label.startswith(DAY_BUTTON_PREFIX)]
+
+    def set_value(self, kind, label, **value):
+        from streamlit.proto.WidgetStates_pb2 import WidgetState
+        widget_id, _ = self.find(kind, label)
+        self.values[widget_id] = WidgetState(id=widget_id, **value)
+
+    async def click(self, action, widget):
+        widget_id, fragment_id = widget
+        await self.rerun(action, trigger=widget_id, fragment_id=fragment_id)
+
+    async def rerun(self, action, trigger=None, fragment_id=""):
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        message = BackMsg()
+        state = message.rerun_script
+        state.query_string = ""
+        state.page_script_hash = ""
+        # Buttons inside a fragment rerun only that fragment, as they do in the browser
+        state.fragment_id = fragment_id
+        for widget in self.values.values():
+            state.widget_states.widgets.add().CopyFrom(widget)
+        if trigger is not None:
+            state.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        start = time.perf_counter()
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+        await asyncio.wait_for(self._until_finished(), self.timeout)
+        self.latencies.append((action, time.perf_counter() - start))
+
+    async def _until_finished(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        while True:
+            message = await self._receive()
+            if message is None:
+                raise ConnectionError("Server closed the session")
+            kind = message.WhichOneof("type")
+            if kind == "delta":
+                self._on_delta(message.delta)
+            elif kind == "script_finished":
+                if message.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    self.errors.append("Script failed to compile")
+                if message.script_finished != ForwardMsg.FINISHED_EARLY_FOR_RERUN:
+                    return
+
+    async def _receive(self):
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        payload = await self.connection.read_message()
+        if payload is None:
+            return None
+        message = ForwardMsg()
+        message.ParseFromString(payload)
+        if message.WhichOneof("type") == "ref_hash":
+            return self.messages.get(message.ref_hash) or await self._fetch_message(message.ref_hash)
+        if message.metadata.cacheable:
+            self.messages[message.hash] = message
+        return message
+
+    async def _fetch_message(self, message_hash):
+        # A reference to a message this session no longer holds; the browser fetches it the same way
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+        from tornado.httpclient import AsyncHTTPClient
+        response = await AsyncHTTPClient().fetch(f"{self.server_url}/_stcore/message?hash={message_hash}")
+        message = ForwardMsg()
+        message.ParseFromString(response.body)
+        self.messages[message_hash] = message
+        return message
+
+    def _on_delta(self, delta):
+        if delta.WhichOneof("type") != "new_element":
+            return
+        element = delta.new_element
+        kind = element.WhichOneof("type")
+        if kind in WIDGET_TYPES:
+            widget = getattr(element, kind)
+            # A fragment's id follows its position on the page, which can differ between runs
+            self.widgets[(kind, widget.label)] = (widget.id, delta.fragment_id)
+        elif kind == "plotly_chart":
+            self.charts += 1
+        elif kind == "exception":
+            self.errors.append(element.exception.message)
+        elif kind == "alert" and element.alert.format == element.alert.ERROR:
+            self.errors.append(element.alert.body)
+
+
+async def visit(session, course, rnd, think_time):
+    # What one member does on the page; pauses of about think_time seconds between actions
+    async def think():
+        if think_time:
+            await asyncio.sleep(rnd.uniform(0.5, 1.5) * think_time)
+
+    await session.connect()
+    await think()
+    session.set_value("text_input", CITY_LABEL, string_value=course)
+    await session.click("oracle", session.find("button", ORACLE_LABEL))
+    if not session.charts:
+        raise LookupError(f"No forecast chart rendered for {course}")
+
+    days = session.day_buttons()
+    for day in rnd.sample(range(1, len(days)), min(2, len(days) - 1)):
+        await think()
+        await session.click("day", days[day])
+
+    await think()
+    session.set_value("number_input", MIN_TEMP_LABEL, int_value=rnd.randint(45, 65))
+    await session.rerun("threshold")
+    await think()
+    session.set_value("number_input", MAX_WIND_LABEL, int_value=rnd.randint(10, 25))
+    await session.rerun("threshold")
+
+    await think()
+    await session.click("day", session.day_buttons()[0])
+
+
+async def run_level(server, sessions, courses, think_time, timeout, seed):
+    rnd = random.Random(seed)
+    # Zipf-like popularity: the first course draws about as many sessions as the next few together
+    weights = [1 / (rank + 1) for rank in range(len(courses))]
+    clients = [Session(server.url, timeout) for _ in range(sessions)]
+
+    async def run(client):
+        try:
+            await visit(client, rnd.choices(courses, weights)[0], random.Random(rnd.random()), think_time)
+        except (asyncio.TimeoutError, ConnectionError, LookupError, OSError) as e:
+            client.errors.append(f"{type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(run(client) for client in clients))
+    elapsed = time.perf_counter() - start
+
+    # Measured before anyone disconnects, so every session's state is still held by the server
+    rss, peak_rss = server.memory()
+    for client in clients:
+        client.close()
+    return clients, elapsed, rss, peak_rss
+
+
+def percentiles(latencies):
+    if not latencies:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": max(latencies) * 1000}
+
+
+def summarize(sessions, clients, elapsed, api_calls, rss, peak_rss):
+    latencies = [seconds for client in clients for _, seconds in client.latencies]
+    by_action = {}
+    for client in clients:
+        for action, seconds in client.latencies:
+            by_action.setdefault(action, []).append(seconds)
+    return {
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "failed_sessions": sum(1 for client in clients if client.errors),
+        "errors": sorted({error for client in clients for error in client.errors})[:10],
+        "elapsed_s": elapsed,
+        **percentiles(latencies),
+        "by_action": {action: percentiles(values) for action, values in by_action.items()},
+        "api_calls": api_calls,
+        "api_calls_per_session": api_calls / sessions,
+        "rss_bytes": rss,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def _mib(value):
+    return f"{value / 2 ** 20:.0f}" if value is not None else "n/a"
+
+
+def _ms(value):
+    return f"{value:.0f}" if value is not None else "n/a"
+
+
+def print_report(levels):
+    print(f"{'sessions':>8} {'reruns':>7} {'failed':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+          f"{'api/sess':>8} {'rss MiB':>8} {'peak MiB':>8}")
+    for level in levels:
+        print(f"{level['sessions']:>8} {level['reruns']:>7} {level['failed_sessions']:>6} {_ms(level['p50_ms']):>8} "
+              f"{_ms(level['p95_ms']):>8} {_ms(level['p99_ms']):>8} {_ms(level['max_ms']):>8} "
+              f"{level['api_calls_per_session']:>8.2f} {_mib(level['rss_bytes']):>8} "
+              f"{_mib(level['peak_rss_bytes']):>8}")
+
+    print()
+    print(f"{'sessions':>8} {'action':<10} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for level in levels:
+        for action, result in level["by_action"].items():
+            print(f"{level['sessions']:>8} {action:<10} {_ms(result['p50_ms']):>8} {_ms(result['p95_ms']):>8} "
+                  f"{_ms(result['p99_ms']):>8}")
+
+    for level in levels:
+        for error in level["errors"]:
+            print(f"ERROR at {level['sessions']} sessions: {error}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-session load test of the Golf-able Oracle app")
+    parser.add_argument("--sessions", type=int, nargs="+", default=DEFAULT_SESSIONS,
+                        help="Concurrent session counts to run, one level each")
+    parser.add_argument("--courses", type=int, default=20, help="Distinct courses the sessions consult")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Mean pause between a session's actions")
+    parser.add_argument("--stub-latency", type=float, default=0.2, help="Seconds the stub takes per request")
+    parser.add_argument("--timeout", type=float, default=120, help="Seconds before a rerun counts as failed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    from tomorrowio_stub import StubConfig, start_in_background
+    config = StubConfig(latency=args.stub_latency, latency_jitter=args.stub_latency / 2)
+    stub, stub_url = start_in_background(config=config)
+    courses = course_names(args.courses)
+
+    levels = []
+    try:
+        for sessions in args.sessions:
+            print(f"... {sessions} sessions", file=sys.stderr)
+            server = Server(stub_url)
+            try:
+                server.wait_until_healthy()
+                calls_before = config.requests
+                clients, elapsed, rss, peak_rss = asyncio.run(
+                    run_level(server, sessions, courses, args.think_time, args.timeout, args.seed))
+                levels.append(summarize(sessions, clients, elapsed, config.requests - calls_before, rss, peak_rss))
+            finally:
+                server.stop()
+    finally:
+        stub.shutdown()
+
+    print_report(levels)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": dt.datetime.now(dt.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "machine": platform.platform(),
+                "args": vars(args),
+                "levels": levels,
+            }, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    sys.exit(1 if any(level["failed_sessions"] for level in levels) else 0)
+
+
+if __name__ == "__main__":
+    main()
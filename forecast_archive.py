@@ -0,0 +1,188 @@
+import argparse
+import datetime as dt
+import itertools
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import oracle_core
+import oracle_metrics
+from gazetteer import resolve_location
+
+# Append-only Parquet archive of every fetched forecast, for drift and history analysis.
+#
+#   archive = ForecastArchive()
+#   archive.append("39.7392,-104.9903", timelines)          # done by fetch_forecast on every fetch
+#   archive.golfable_hours("Denver, CO", months=3)           # final forecast of each day, last 3 months
+#   archive.golfable_hours("Denver, CO", latest_only=False)  # every forecast of every day, for drift
+#
+# Layout: <root>/location=<place>/date=<local forecast date>/<fetched at>-<pid>-<n>.parquet, one
+# file per fetch and day, never rewritten. Rows are the sub-daily intervals in compact types
+# (UTC timestamps, float32 weather, a dictionary-coded timestep, a daylight flag), zstd compressed.
+# Queries list only the partitions of the requested course and dates and memory-map those files.
+
+DEFAULT_ARCHIVE_PATH = os.path.join(".oracle_cache", "archive")
+
+SCHEMA = pa.schema([
+    ("fetched_at", pa.timestamp("s", tz="UTC")),
+    ("start_time", pa.timestamp("s", tz="UTC")),
+    ("timestep", pa.dictionary(pa.int8(), pa.string())),
+    ("temperature", pa.float32()),
+    ("wind_speed", pa.float32()),
+    ("precip_prob", pa.float32()),
+    ("daylight", pa.bool_()),
+])
+
+_PARTITION_NAME = re.compile(r"[^\w.,+-]")
+
+
+def partition_name(location):
+    # Resolved coordinates where the gazetteer knows the place, so spellings share a partition
+    return _PARTITION_NAME.sub("_", resolve_location(location)["query"])
+
+
+class ForecastArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_PATH):
+        self.root = root
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def append(self, location, timelines, fetched_at=None):
+        fetched_at = fetched_at or dt.datetime.now(dt.timezone.utc)
+        place = resolve_location(location)
+        resolution = oracle_core.sub_daily_timeline(timelines)
+
+        with oracle_metrics.span("archive_append"):
+            forecast_df = oracle_core.forecast_frame(timelines[resolution], place["timezone"])
+            daylight = oracle_core.filter_forecast_by_sunrise_sunset(
+                forecast_df, oracle_core.daylight_index(timelines["1d"], place["timezone"]))
+            times = forecast_df["datetime"].to_numpy(dtype="datetime64[s]")
+            fetched = np.full(len(times), np.datetime64(int(fetched_at.timestamp()), "s"))
+
+            table = pa.Table.from_arrays([
+                pa.array(fetched).cast(SCHEMA.field("fetched_at").type),
+                pa.array(times).cast(SCHEMA.field("start_time").type),
+                pa.DictionaryArray.from_arrays(np.zeros(len(times), dtype=np.int8), pa.array([resolution])),
+                pa.array(forecast_df["temperature"].to_numpy(dtype=np.float32)),
+                pa.array(forecast_df["wind_speed"].to_numpy(dtype=np.float32)),
+                pa.array(forecast_df["precip_prob"].to_numpy(dtype=np.float32)),
+                pa.array(np.isin(times, daylight["datetime"].to_numpy(dtype="datetime64[s]"))),
+            ], schema=SCHEMA)
+
+            # One file per local forecast date; rows are in time order, so each date is one slice
+            dates = forecast_df["date"].dt.strftime("%Y-%m-%d").to_numpy()
+            starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]]) if len(dates) else []
+            stops = np.r_[starts[1:], len(dates)] if len(dates) else []
+            for start, stop in zip(starts, stops):
+                self._write(partition_name(location), dates[start], fetched_at, table.slice(start, stop - start))
+
+        oracle_metrics.increment("archived_rows", len(table))
+
+    def _write(self, location, date, fetched_at, table):
+        directory = os.path.join(self.root, f"location={location}", f"date={date}")
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            sequence = next(self._sequence)
+        stamp = fetched_at.astimezone(dt.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = f"{stamp}-{os.getpid()}-{sequence}.parquet"
+
+        # Written under a temporary name and renamed, so readers never see a partial file
+        temporary = os.path.join(directory, f".{name}.tmp")
+        pq.write_table(table, temporary, compression="zstd")
+        os.replace(temporary, os.path.join(directory, name))
+
+    def partitions(self, location, since=None, until=None):
+        # Partition files of one course with forecast dates in [since, until], found by listing only
+        directory = os.path.join(self.root, f"location={partition_name(location)}")
+        if not os.path.isdir(directory):
+            return []
+
+        since = since.isoformat() if since else None
+        until = until.isoformat() if until else None
+        paths = []
+        for entry in sorted(os.listdir(directory)):
+            date = entry.partition("=")[2]
+            if not entry.startswith("date=") or (since and date < since) or (until and date > until):
+                continue
+            partition = os.path.join(directory, entry)
+            paths.extend(os.path.join(partition, name) for name in sorted(os.listdir(partition))
+                         if name.endswith(".parquet"))
+        return paths
+
+    def query(self, location, since=None, until=None, columns=None):
+        # Archived rows for a course and date range; files are memory-mapped, not read into buffers
+        paths = self.partitions(location, since, until)
+        if not paths:
+            return SCHEMA.empty_table().select(columns or SCHEMA.names)
+        with oracle_metrics.span("archive_query"):
+            return pa.concat_tables([pq.read_table(path, columns=columns, memory_map=True, partitioning=None)
+                                     for path in paths])
+
+    def golfable_hours(self, location, months=3, min_temp=50, max_wind=15, max_rain=20, latest_only=True,
+                       today=None):
+        # Golf-able hours per local day from `months` ago through the end of the newest forecast.
+        # With latest_only every interval is judged by the last forecast fetched for it, and
+        # fetched_at is the newest fetch behind the day; otherwise every fetch of every day is kept,
+        # with its lead time, to show how the forecast for a day drifted.
+        tz = resolve_location(location)["timezone"]
+        today = today or oracle_core.local_today(tz)
+        since = (pd.Timestamp(today) - pd.DateOffset(months=months)).date()
+
+        table = self.query(location, since, None, ["fetched_at", "start_time", "temperature", "wind_speed",
+                                                   "precip_prob", "daylight"])
+        columns = ["date", "fetched_at", "lead_days", "golfable_hours"]
+        if table.num_rows == 0:
+            return pd.DataFrame(columns=columns)
+
+        rows = table.filter(table.column("daylight")).to_pandas()
+        # Windows of one refresh can overlap at their edges; the later file wins
+        rows = rows.drop_duplicates(["fetched_at", "start_time"], keep="last")
+        rows["datetime"] = rows["start_time"].dt.tz_convert(tz)
+        rows["date"] = rows["datetime"].dt.normalize()
+
+        if latest_only:
+            # Per interval, not per day: a fetch that covered only part of a day (a refresh window
+            # archived before refreshes were stored whole) must not stand in for the whole day
+            latest = rows.sort_values("fetched_at", kind="stable").drop_duplicates("start_time", keep="last")
+            snapshots = [latest]
+        else:
+            # One snapshot per fetch, so windows never join rows of different forecasts
+            snapshots = [snapshot for _, snapshot in rows.groupby("fetched_at", sort=True)]
+
+        results = []
+        for snapshot in snapshots:
+            snapshot = snapshot.sort_values("datetime").reset_index(drop=True)
+            windows = oracle_core.golfable_windows(
+                snapshot, oracle_core.golfable_mask(snapshot, min_temp, max_wind, max_rain))
+            last_fetch = snapshot.groupby("date")["fetched_at"].max()
+            fetched = {day.date(): fetched_at for day, fetched_at in last_fetch.items()}
+            for day, hours in oracle_core.golfable_hours_per_day(snapshot, windows).items():
+                fetched_day = fetched[day].tz_convert(tz).date()
+                results.append((day, fetched[day], (day - fetched_day).days, hours))
+
+        return pd.DataFrame(results, columns=columns).sort_values(["date", "fetched_at"]).reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Golf-able hours per day from the forecast archive")
+    parser.add_argument("location", help="Course location, as typed in the app")
+    parser.add_argument("--months", type=int, default=3, help="How far back to look")
+    parser.add_argument("--min-temp", type=float, default=50)
+    parser.add_argument("--max-wind", type=float, default=15)
+    parser.add_argument("--max-rain", type=float, default=20)
+    parser.add_argument("--drift", action="store_true", help="One row per fetch of each day, not just the last")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="Archive directory")
+    args = parser.parse_args()
+
+    hours = ForecastArchive(args.archive).golfable_hours(
+        args.location, args.months, args.min_temp, args.max_wind, args.max_rain, latest_only=not args.drift)
+    print(hours.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import oracle_metrics
+
+# Where the on-disk tier lives so forecasts survive a Streamlit restart
+DEFAULT_CACHE_PATH = os.path.join(".oracle_cache", "forecasts.sqlite3")
+
+# How long a cached forecast is served before tomorrow.io is asked again
+DEFAULT_TTL_SECONDS = 30 * 60
+
+# How long past its TTL a forecast may still be served while a refresh runs in the background
+DEFAULT_MAX_STALE_SECONDS = 3 * 60 * 60
+
+# Size limits for the two tiers
+DEFAULT_MAX_MEMORY_ENTRIES = 64
+DEFAULT_MAX_DISK_BYTES = 50 * 1024 * 1024
+
+# Forecasts are bucketed per hour so a key never outlives the data it points to
+HOUR_BUCKET_SECONDS = 3600
+
+
+def normalize_location(location):
+    # "denver", "Denver " and " DENVER" all collapse onto the same key
+    return " ".join(str(location).split()).casefold()
+
+
+def encode_json(payload):
+    return json.dumps(payload).encode("utf-8")
+
+
+def decode_json(blob):
+    return json.loads(blob)
+
+
+class _InFlight:
+    # One fetch for a key that any number of callers can wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ForecastCache:
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl_seconds=DEFAULT_TTL_SECONDS,
+                 max_memory_entries=DEFAULT_MAX_MEMORY_ENTRIES, max_disk_bytes=DEFAULT_MAX_DISK_BYTES,
+                 encode=encode_json, decode=decode_json, max_stale_seconds=DEFAULT_MAX_STALE_SECONDS):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_stale_seconds = max_stale_seconds
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+
+        # How payloads are turned into bytes for the disk tier; JSON unless the caller stores arrays
+        self.encode = encode
+        self.decode = decode
+
+        # In-memory LRU tier: key -> (created, payload)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+        # key -> _InFlight for keys being fetched right now
+        self._inflight = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+        self._db = None
+        if path:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS forecasts (
+                    key TEXT PRIMARY KEY,
+                    base_key TEXT NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    payload BLOB NOT NULL
+                )
+                """
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS forecasts_base_key ON forecasts (base_key, bucket)")
+            self._db.commit()
+
+    def make_key(self, location, fields, timesteps, units, horizon=None, now=None):
+        now = time.time() if now is None else now
+        base_key = json.dumps([normalize_location(location), sorted(fields), sorted(timesteps), units, horizon])
+        bucket = int(now // HOUR_BUCKET_SECONDS)
+        return base_key, bucket
+
+    def get(self, key, now=None):
+        now = time.time() if now is None else now
+        key_str = self._key_str(key)
+
+        with self._lock:
+            # Memory tier first
+            entry = self._memory.get(key_str)
+            if entry is not None:
+                created, payload = entry
+                if now - created <= self.ttl_seconds:
+                    self._memory.move_to_end(key_str)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    oracle_metrics.increment("cache_hits")
+                    return payload
+                # Past its TTL; kept around for get_stale until the stale window closes too
+                if now - created > self.ttl_seconds + self.max_stale_seconds:
+                    del self._memory[key_str]
+
+            # Then the disk tier
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, payload FROM forecasts WHERE key = ?", (key_str,)
+                ).fetchone()
+                if row is not None:
+                    created, blob = row
+                    payload = None
+                    if now - created <= self.ttl_seconds:
+                        try:
+                            payload = self.decode(zlib.decompress(blob))
+                        except (ValueError, OSError, zlib.error):
+                            # Written by an older format; drop it and fetch again
+                            payload = None
+                    if payload is not None:
+                        self._db.execute("UPDATE forecasts SET last_access = ? WHERE key = ?", (now, key_str))
+                        self._db.commit()
+                        self._remember(key_str, created, payload)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        oracle_metrics.increment("cache_hits")
+                        return payload
+                    # Undecodable, or past the stale window too; expired rows stay for get_stale
+                    if now - created <= self.ttl_seconds or now - created > self.ttl_seconds + self.max_stale_seconds:
+                        self._db.execute("DELETE FROM forecasts WHERE key = ?", (key_str,))
+                        self._db.commit()
+
+            self.misses += 1
+            oracle_metrics.increment("cache_misses")
+            return None
+
+    def get_stale(self, key, now=None):
+        # Newest forecast for the key's location and shape in any hour bucket, expired or not,
+        # as (created, payload); None once it is older than TTL plus the stale window
+        now = time.time() if now is None else now
+        base_key, _ = key
+        oldest = now - self.ttl_seconds - self.max_stale_seconds
+
+        with self._lock:
+            newest = None
+            for key_str, (created, payload) in self._memory.items():
+                if key_str.rpartition("@")[0] == base_key and created >= oldest:
+                    if newest is None or created > newest[0]:
+                        newest = (created, payload)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT created, payload FROM forecasts WHERE base_key = ? AND created >= ? "
+                    "ORDER BY created DESC LIMIT 1", (base_key, oldest if newest is None else newest[0])
+                ).fetchone()
+                if row is not None and (newest is None or row[0] > newest[0]):
+                    try:
+                        newest = (row[0], self.decode(zlib.decompress(row[1])))
+                    except (ValueError, OSError, zlib.error):
+                        pass
+
+            return newest
+
+    def created_at(self, key):
+        # When the entry for exactly this key was stored, without counting a hit or miss
+        key_str = self._key_str(key)
+        with self._lock:
+            entry = self._memory.get(key_str)
+            if entry is not None:
+                return entry[0]
+            if self._db is not None:
+                row = self._db.execute("SELECT created FROM forecasts WHERE key = ?", (key_str,)).fetchone()
+                if row is not None:
+                    return row[0]
+            return None
+
+    def peek(self, key, now=None):
+        # Fresh in-memory payload for exactly this key, without counting a hit or miss; set() always
+        # stores into memory, so a fetch that has just finished is found here
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._memory.get(self._key_str(key))
+            if entry is not None and now - entry[0] <= self.ttl_seconds:
+                return entry[1]
+            return None
+
+    def single_flight(self, key, fetch):
+        # Runs fetch() for one caller per key at a time; callers arriving meanwhile wait and share its
+        # result (or its error), so a cold key costs one fetch, one set and one archive however many
+        # sessions miss it together
+        key_str = self._key_str(key)
+        with self._lock:
+            call = self._inflight.get(key_str)
+            leader = call is None
+            if leader:
+                call = self._inflight[key_str] = _InFlight()
+            else:
+                self.coalesced += 1
+                oracle_metrics.increment("cache_coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key_str, None)
+            call.done.set()
+
+    def set(self, key, payload, now=None):
+        now = time.time() if now is None else now
+        key_str = self._key_str(key)
+        base_key, bucket = key
+
+        with self._lock:
+            self._remember(key_str, now, payload)
+
+            if self._db is not None:
+                blob = zlib.compress(self.encode(payload))
+                self._db.execute(
+                    "INSERT OR REPLACE INTO forecasts (key, base_key, bucket, created, last_access, size, payload) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (key_str, base_key, bucket, now, now, len(blob), blob),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def get_or_fetch(self, location, fields, timesteps, units, fetch, horizon=None, update=None):
+        # update(previous) refreshes an expired copy incrementally; without one the full fetch runs
+        key = self.make_key(location, fields, timesteps, units, horizon)
+        payload = self.get(key)
+        if payload is not None:
+            return payload
+
+        def fetch_and_store():
+            # A caller that missed just before the previous fetch finished finds its result here
+            payload = self.peek(key)
+            if payload is not None:
+                return payload
+            stale = self.get_stale(key) if update is not None else None
+            payload = update(stale[1]) if stale is not None else fetch()
+            # Failed fetches are not cached so the next consultation tries again
+            if payload is not None:
+                self.set(key, payload)
+            return payload
+
+        return self.single_flight(key, fetch_and_store)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM forecasts")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            disk_entries, disk_bytes = 0, 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM forecasts"
+                ).fetchone()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+                "coalesced": self.coalesced,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+                "disk_bytes": disk_bytes,
+            }
+
+    def _key_str(self, key):
+        base_key, bucket = key
+        return f"{base_key}@{bucket}"
+
+    def _remember(self, key_str, created, payload):
+        self._memory[key_str] = (created, payload)
+        self._memory.move_to_end(key_str)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self, now):
+        # Rows past the stale window go first, then least recently used rows until under the size limit
+        cursor = self._db.execute("DELETE FROM forecasts WHERE created < ?",
+                                  (now - self.ttl_seconds - self.max_stale_seconds,))
+        self.evictions += cursor.rowcount
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM forecasts").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        for key_str, size in self._db.execute(
+            "SELECT key, size FROM forecasts ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM forecasts WHERE key = ?", (key_str,))
+            total -= size
+            self.evictions += 1
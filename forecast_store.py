@@ -0,0 +1,141 @@
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import oracle_metrics
+
+# Process-wide store of parsed forecasts, shared by every Streamlit session.
+#
+# Each distinct forecast (content version + zone) is parsed once into an immutable Arrow table of
+# its daylight rows (float32 weather columns). Sessions share one read-only pandas frame of it,
+# whose weather columns are views over the Arrow buffers and whose timestamp columns are converted
+# once, plus the threshold sort orders and per-day slices built once per forecast. Memory grows
+# with the number of distinct locations, not with sessions.
+
+DEFAULT_MAX_FORECASTS = 256
+
+
+def _read_only(array):
+    array.flags.writeable = False
+    return array
+
+
+def _freeze(column):
+    # np.asarray hands back the column's own buffer (a tz-aware column's as datetime64), not a view,
+    # so the flag stops writes through any frame or series sharing it
+    dtype = "M8[ns]" if isinstance(column.dtype, pd.DatetimeTZDtype) else None
+    _read_only(np.asarray(column.array, dtype=dtype))
+
+
+class StoredForecast:
+    def __init__(self, filtered_forecast, daily_values, sorted_columns):
+        # Columns: datetime, date (tz-aware), temperature, wind_speed, precip_prob (float32)
+        # NaN stays NaN rather than becoming a null, so weather columns convert without a copy
+        self.table = pa.table({name: pa.array(column, from_pandas=not pd.api.types.is_float_dtype(column))
+                               for name, column in filtered_forecast.items()})
+        self.tz = filtered_forecast["datetime"].dt.tz
+
+        # One block per column: the float columns are views of the Arrow buffers, the tz-aware
+        # timestamps are converted once; every column is made read-only, since all sessions share it
+        self.frame = self.table.to_pandas(split_blocks=True)
+        for name in self.frame.columns:
+            _freeze(self.frame[name])
+
+        # date -> temperatureMax, windSpeed, precipitationProbability, sunriseTime, sunsetTime
+        self.daily_values = daily_values
+
+        # column -> (row order, sorted values), shared by every session's ThresholdIndex
+        self.sorted_columns = {column: (_read_only(order), _read_only(values))
+                               for column, (order, values) in sorted_columns.items()}
+
+        # Rows are in time order, so each local day is one contiguous row range
+        days = self.frame["date"].to_numpy(dtype="datetime64[ns]")
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]]) if len(days) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(days)]
+        self.day_rows = {pd.Timestamp(days[start]).tz_localize("UTC").tz_convert(self.tz).date(): (start, stop)
+                         for start, stop in zip(starts, stops)}
+
+        # date -> content hash of the day's rows and daily values; unchanged days of a refreshed
+        # forecast keep their hash, so their views and figures are reused
+        self.day_versions = {day: self._day_version(day) for day in daily_values}
+
+        self._day_frames = {}
+        self._lock = threading.Lock()
+
+    def _day_version(self, day):
+        start, stop = self.day_rows.get(day, (0, 0))
+        checksum = zlib.crc32(repr((str(self.tz), sorted(self.daily_values[day].items()))).encode("utf-8"))
+        for name in ("datetime", "temperature", "wind_speed", "precip_prob"):
+            column = self.table.column(name).slice(start, stop - start).to_numpy()
+            checksum = zlib.crc32(np.ascontiguousarray(column).view(np.uint8), checksum)
+        return checksum
+
+    def day_frame(self, day):
+        # Daylight rows of one local day plus the chart's time labels, built once and shared
+        with self._lock:
+            frame = self._day_frames.get(day)
+            if frame is None:
+                start, stop = self.day_rows.get(day, (0, 0))
+                rows = self.frame.iloc[start:stop]
+                frame = pd.DataFrame({name: rows[name] for name in rows.columns}, copy=False)
+                frame["time_display"] = _read_only(rows["datetime"].dt.strftime("%I:%M %p").to_numpy())
+                self._day_frames[day] = frame
+            return frame
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes + sum(order.nbytes + values.nbytes for order, values in self.sorted_columns.values())
+
+
+class ForecastStore:
+    def __init__(self, max_forecasts=DEFAULT_MAX_FORECASTS):
+        self.max_forecasts = max_forecasts
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_build(self, key, build):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                oracle_metrics.increment("store_hits")
+                return entry
+
+        # Built outside the lock; if two sessions race, the first stored entry wins and is shared
+        entry = build()
+
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None:
+                self.hits += 1
+                return existing
+            self._entries[key] = entry
+            self.misses += 1
+            oracle_metrics.increment("store_misses")
+            while len(self._entries) > self.max_forecasts:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "forecasts": len(self._entries),
+                "bytes": sum(entry.nbytes for entry in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
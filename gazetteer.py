@@ -0,0 +1,183 @@
+import csv
+import functools
+import os
+import re
+import threading
+
+import numpy as np
+
+from forecast_cache import normalize_location
+
+# Offline location resolver: free-text course locations -> canonical coordinates and IANA timezone.
+#
+#   resolve_location("denver")      -> Denver, CO at 39.7392,-104.9903 in America/Denver
+#   resolve_location("Denver, CO ") -> the same place, so both share one cache entry and one request
+#
+# Places come from gazetteer.csv next to this file (ORACLE_GAZETTEER points at a bigger one).
+# Input that matches nothing is passed to tomorrow.io as typed, in the original Mountain zone.
+
+DEFAULT_GAZETTEER_PATH = os.environ.get(
+    "ORACLE_GAZETTEER", os.path.join(os.path.dirname(os.path.abspath(__file__)), "gazetteer.csv"))
+
+# Zone used for locations the gazetteer cannot place, as before it existed
+DEFAULT_TIMEZONE = "US/Mountain"
+
+# Memoized resolutions per process
+RESOLVE_CACHE_SIZE = 4096
+
+US_STATES = {
+    "AL": "alabama", "AK": "alaska", "AZ": "arizona", "AR": "arkansas", "CA": "california",
+    "CO": "colorado", "CT": "connecticut", "DE": "delaware", "DC": "district of columbia",
+    "FL": "florida", "GA": "georgia", "HI": "hawaii", "ID": "idaho", "IL": "illinois", "IN": "indiana",
+    "IA": "iowa", "KS": "kansas", "KY": "kentucky", "LA": "louisiana", "ME": "maine", "MD": "maryland",
+    "MA": "massachusetts", "MI": "michigan", "MN": "minnesota", "MS": "mississippi", "MO": "missouri",
+    "MT": "montana", "NE": "nebraska", "NV": "nevada", "NH": "new hampshire", "NJ": "new jersey",
+    "NM": "new mexico", "NY": "new york", "NC": "north carolina", "ND": "north dakota", "OH": "ohio",
+    "OK": "oklahoma", "OR": "oregon", "PA": "pennsylvania", "RI": "rhode island", "SC": "south carolina",
+    "SD": "south dakota", "TN": "tennessee", "TX": "texas", "UT": "utah", "VT": "vermont",
+    "VA": "virginia", "WA": "washington", "WV": "west virginia", "WI": "wisconsin", "WY": "wyoming",
+}
+
+REGIONS = {
+    "ON": "ontario", "BC": "british columbia", "AB": "alberta", "NSW": "new south wales",
+    "VIC": "victoria", "BCS": "baja california sur",
+}
+
+COUNTRIES = {
+    "US": ["usa", "united states", "united states of america", "america"],
+    "GB": ["uk", "united kingdom", "great britain", "britain"],
+    "IE": ["ireland"],
+    "FR": ["france"],
+    "ES": ["spain"],
+    "CA": ["canada"],
+    "MX": ["mexico"],
+    "AU": ["australia"],
+    "JP": ["japan"],
+    "AE": ["uae", "united arab emirates"],
+    "ZA": ["south africa"],
+}
+
+COORDINATES = re.compile(r"^\s*([-+]?\d{1,2}(?:\.\d+)?)\s*,\s*([-+]?\d{1,3}(?:\.\d+)?)\s*$")
+
+_places = None
+_names = None
+_qualifier_words = None
+_coordinates = None
+_lock = threading.Lock()
+
+
+def _clean(text):
+    # "St. Louis,  MO" -> "st louis, mo"; commas are kept to separate qualifiers
+    return normalize_location(re.sub(r"[^\w,\s-]", " ", str(text)).replace("-", " "))
+
+
+def _load(path=DEFAULT_GAZETTEER_PATH):
+    global _places, _names, _qualifier_words, _coordinates
+    with _lock:
+        if _places is not None:
+            return
+
+        places, names = [], {}
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                admin, country = row["admin"], row["country"]
+                latitude, longitude = float(row["latitude"]), float(row["longitude"])
+                qualifiers = {_clean(admin), _clean(country), *COUNTRIES.get(country, [])}
+                full_admin = US_STATES.get(admin) if country == "US" else REGIONS.get(admin)
+                if full_admin:
+                    qualifiers.add(full_admin)
+                place = {
+                    "name": f"{row['name']}, {admin}" if country == "US" else f"{row['name']}, {admin}, {country}",
+                    "query": f"{latitude:.4f},{longitude:.4f}",
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "timezone": row["timezone"],
+                    "population": int(row["population"] or 0),
+                    "qualifiers": qualifiers,
+                }
+                places.append(place)
+                aliases = [a for a in row["aliases"].split(";") if a.strip()]
+                for name in [row["name"], *aliases]:
+                    names.setdefault(_clean(name), []).append(place)
+
+        # Most populous first, so an unqualified "Portland" is the larger one
+        for candidates in names.values():
+            candidates.sort(key=lambda p: -p["population"])
+
+        qualifier_words = set(_clean(q) for q in [*US_STATES, *US_STATES.values(), *REGIONS, *REGIONS.values()])
+        qualifier_words.update(_clean(c) for c in COUNTRIES)
+        qualifier_words.update(n for aliases in COUNTRIES.values() for n in aliases)
+        for place in places:
+            qualifier_words.update(place["qualifiers"])
+
+        _qualifier_words = qualifier_words
+        _coordinates = np.radians(np.array([[p["latitude"], p["longitude"]] for p in places]))
+        _names = names
+        _places = places
+
+
+def _qualified(place, qualifiers):
+    # Every qualifier the user gave ("co", "colorado", "usa") has to describe the place
+    return all(q in place["qualifiers"] for q in qualifiers)
+
+
+def _split_qualifiers(tokens):
+    # Greedy longest match of trailing words against known qualifiers, "new south wales" before "new"
+    qualifiers, i = [], 0
+    while i < len(tokens):
+        for j in range(len(tokens), i, -1):
+            candidate = " ".join(tokens[i:j])
+            if candidate in _qualifier_words:
+                qualifiers.append(candidate)
+                i = j
+                break
+        else:
+            return None
+    return qualifiers
+
+
+def nearest_timezone(latitude, longitude):
+    # Zone of the closest gazetteer place, one vectorized haversine over the whole table
+    _load()
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    dlat = _coordinates[:, 0] - lat
+    dlon = _coordinates[:, 1] - lon
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat) * np.cos(_coordinates[:, 0]) * np.sin(dlon / 2) ** 2
+    return _places[int(np.argmin(a))]["timezone"]
+
+
+def resolve_location(location):
+    return _resolve(_clean(location), " ".join(str(location).split()))
+
+
+@functools.lru_cache(maxsize=RESOLVE_CACHE_SIZE)
+def _resolve(cleaned, typed):
+    _load()
+
+    match = COORDINATES.match(typed)
+    if match:
+        latitude, longitude = float(match.group(1)), float(match.group(2))
+        if -90 <= latitude <= 90 and -180 <= longitude <= 180:
+            query = f"{latitude:.4f},{longitude:.4f}"
+            return {"name": query, "query": query, "latitude": latitude, "longitude": longitude,
+                    "timezone": nearest_timezone(latitude, longitude), "resolved": True}
+
+    parts = [part.strip() for part in cleaned.split(",") if part.strip()]
+    if parts:
+        tokens = parts[0].split()
+        # Try the longest leading run of words as the place name, the rest as qualifiers
+        for i in range(len(tokens), 0, -1):
+            candidates = _names.get(" ".join(tokens[:i]))
+            if not candidates:
+                continue
+            qualifiers = _split_qualifiers(tokens[i:] + [w for part in parts[1:] for w in part.split()])
+            if qualifiers is None:
+                continue
+            for place in candidates:
+                if _qualified(place, qualifiers):
+                    return {"name": place["name"], "query": place["query"], "latitude": place["latitude"],
+                            "longitude": place["longitude"], "timezone": place["timezone"], "resolved": True}
+
+    # Unknown to the gazetteer: let tomorrow.io geocode the text, keyed on its normalized form
+    return {"name": typed, "query": normalize_location(typed), "latitude": None, "longitude": None,
+            "timezone": DEFAULT_TIMEZONE, "resolved": False}
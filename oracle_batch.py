@@ -0,0 +1,263 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import oracle_core
+from forecast_archive import DEFAULT_ARCHIVE_PATH, ForecastArchive
+from forecast_cache import DEFAULT_CACHE_PATH, ForecastCache
+from gazetteer import resolve_location
+from timeline_parser import decode_timelines, encode_timelines
+from tomorrowio_client import DEFAULT_BASE_URL, TomorrowioClient, TomorrowioError
+
+# Batch mode: golf-able hours for every location x threshold profile, without the Streamlit page.
+#
+#   python oracle_batch.py courses.csv --profiles profiles.jsonl --output golfable.parquet
+#   python oracle_batch.py courses.jsonl --workers 8 --rate 5 --output - > golfable.jsonl
+#
+# Locations come from a CSV with a "location" column (or the first column) or JSONL objects with a
+# "location" key. Profiles carry name, min_temp, max_wind and max_rain; without a profiles file the
+# sidebar defaults are used. Locations are read lazily and only a few per worker are in flight, and
+# each location's rows are written as soon as it finishes, so memory stays flat for any input size.
+
+DEFAULT_PROFILE = {"name": "default", "min_temp": 50, "max_wind": 15, "max_rain": 20}
+
+# Locations queued per worker process before the reader waits for results
+IN_FLIGHT_PER_WORKER = 4
+
+# Rows buffered per Parquet row group
+PARQUET_ROW_GROUP = 10000
+
+OUTPUT_COLUMNS = ["location", "profile", "date", "golfable_hours", "windows", "longest_window_hours",
+                  "first_window_start"]
+
+# Per-process client, cache and archive, created once by the pool initializer
+_client = None
+_cache = None
+_archive = None
+
+
+def read_records(path):
+    # Yield one dict per row of a CSV or JSONL file
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from csv.DictReader(f)
+
+
+def read_locations(path):
+    for record in read_records(path):
+        location = record.get("location") or next(iter(record.values()), None)
+        if location and str(location).strip():
+            yield str(location).strip()
+
+
+def read_profiles(path):
+    if path is None:
+        return [DEFAULT_PROFILE]
+    profiles = []
+    for i, record in enumerate(read_records(path)):
+        profiles.append({
+            "name": record.get("name") or f"profile-{i + 1}",
+            "min_temp": float(record["min_temp"]),
+            "max_wind": float(record["max_wind"]),
+            "max_rain": float(record["max_rain"]),
+        })
+    return profiles
+
+
+def init_worker(api_key, base_url, mode, cassette_dir, requests_per_second, cache_path, archive_path):
+    global _client, _cache, _archive
+    _client = TomorrowioClient(api_key, base_url=base_url, mode=mode, cassette_dir=cassette_dir,
+                               max_requests_per_second=requests_per_second)
+    # The SQLite tier is shared by every worker; an empty path keeps each worker's cache in memory
+    _cache = ForecastCache(path=cache_path or None, encode=encode_timelines, decode=decode_timelines)
+    # Workers append their own files to the same archive; nothing is ever rewritten
+    _archive = ForecastArchive(archive_path) if archive_path else None
+
+
+def daily_rows(location, profile, forecast_df, windows):
+    golfable_hours = oracle_core.golfable_hours_per_day(forecast_df, windows)
+    by_day = {}
+    for day, start, hours in zip(windows["day"], windows["start_time"], windows["hours"]):
+        by_day.setdefault(day.date(), []).append((start, hours))
+
+    rows = []
+    for day, hours in golfable_hours.items():
+        day_windows = by_day.get(day, [])
+        rows.append({
+            "location": location,
+            "profile": profile["name"],
+            "date": day.isoformat(),
+            "golfable_hours": int(hours),
+            "windows": len(day_windows),
+            "longest_window_hours": float(max((h for _, h in day_windows), default=0.0)),
+            "first_window_start": day_windows[0][0].isoformat() if day_windows else None,
+        })
+    return rows
+
+
+def evaluate_location(location, profiles, resolution, horizon_days):
+    # Runs in a worker: one fetch and parse, then every profile against the same threshold index
+    try:
+        place = resolve_location(location)
+        data = oracle_core.fetch_forecast(_cache, _client, place["query"], resolution, horizon_days, _archive)
+        forecast = oracle_core.parse_forecast(location, data, place["timezone"])
+    except (TomorrowioError, KeyError, IndexError) as error:
+        return location, None, str(error) or type(error).__name__
+
+    rows = []
+    for profile in profiles:
+        windows = forecast["threshold_index"].windows(profile["min_temp"], profile["max_wind"], profile["max_rain"])
+        rows.extend(daily_rows(location, profile, forecast["filtered_forecast"], windows))
+    return location, rows, None
+
+
+class JsonlWriter:
+    def __init__(self, path):
+        self._file = sys.stdout if path == "-" else open(path, "w", encoding="utf-8")
+
+    def write(self, rows):
+        for row in rows:
+            self._file.write(json.dumps(row) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+
+class ParquetWriter:
+    # Rows are buffered into fixed-size row groups so the file streams without holding the run
+    def __init__(self, path, row_group_size=PARQUET_ROW_GROUP):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self._pa = pa
+        self._schema = pa.schema([
+            ("location", pa.string()),
+            ("profile", pa.string()),
+            ("date", pa.string()),
+            ("golfable_hours", pa.int32()),
+            ("windows", pa.int32()),
+            ("longest_window_hours", pa.float32()),
+            ("first_window_start", pa.string()),
+        ])
+        self._writer = pq.ParquetWriter(path, self._schema)
+        self._row_group_size = row_group_size
+        self._buffer = []
+
+    def write(self, rows):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self._row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if self._buffer:
+            columns = {name: [row[name] for row in self._buffer] for name in OUTPUT_COLUMNS}
+            self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+            self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+
+def open_writer(path):
+    if path.endswith(".parquet"):
+        return ParquetWriter(path)
+    return JsonlWriter(path)
+
+
+def run_batch(locations, profiles, writer, workers, executor_args, progress=None,
+              resolution=oracle_core.DEFAULT_RESOLUTION, horizon_days=oracle_core.DEFAULT_HORIZON_DAYS):
+    # Keep a bounded number of locations in flight and write each one as it completes
+    succeeded, failed, rows_written = 0, [], 0
+    max_in_flight = workers * IN_FLIGHT_PER_WORKER
+    locations = iter(locations)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=executor_args) as executor:
+        pending = set()
+        exhausted = False
+        while pending or not exhausted:
+            while not exhausted and len(pending) < max_in_flight:
+                location = next(locations, None)
+                if location is None:
+                    exhausted = True
+                    break
+                pending.add(executor.submit(evaluate_location, location, profiles, resolution, horizon_days))
+
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                location, rows, error = future.result()
+                if error is not None:
+                    failed.append((location, error))
+                    continue
+                writer.write(rows)
+                succeeded += 1
+                rows_written += len(rows)
+                if progress is not None:
+                    progress(succeeded + len(failed))
+
+    return succeeded, failed, rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute golf-able hours for many locations at once")
+    parser.add_argument("locations", help="CSV or JSONL file of locations")
+    parser.add_argument("--profiles", default=None, help="CSV or JSONL file of threshold profiles")
+    parser.add_argument("--output", default="-", help="Output .jsonl or .parquet file, - for stdout JSONL")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--resolution", default=oracle_core.DEFAULT_RESOLUTION, choices=["1m", "5m", "15m", "30m", "1h"],
+                        help="Sub-daily timestep to request")
+    parser.add_argument("--horizon-days", type=int, default=oracle_core.DEFAULT_HORIZON_DAYS,
+                        help="Days ahead to request, clamped to what tomorrow.io serves at that resolution")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="Maximum tomorrow.io requests per second across all workers")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Shared forecast cache, '' to disable")
+    parser.add_argument("--archive", default=DEFAULT_ARCHIVE_PATH, help="Forecast archive directory, '' to disable")
+    parser.add_argument("--base-url", default=os.environ.get("TOMORROWIO_BASE_URL", DEFAULT_BASE_URL))
+    parser.add_argument("--mode", default=os.environ.get("TOMORROWIO_MODE", "live"), help="live, record or replay")
+    parser.add_argument("--cassette-dir", default=os.environ.get(
+        "TOMORROWIO_CASSETTE_DIR", os.path.join(".oracle_cache", "cassettes")))
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    # Each worker gets an equal share of the overall request budget
+    requests_per_second = args.rate / workers if args.rate else None
+    executor_args = (os.environ.get("TOMORROWIO_API_KEY"), args.base_url, args.mode, args.cassette_dir,
+                     requests_per_second, args.cache, args.archive)
+
+    profiles = read_profiles(args.profiles)
+    writer = open_writer(args.output)
+    start = time.perf_counter()
+
+    def progress(count):
+        if count % 100 == 0:
+            print(f"... {count} locations in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+    try:
+        succeeded, failed, rows_written = run_batch(
+            read_locations(args.locations), profiles, writer, workers, executor_args, progress,
+            args.resolution, args.horizon_days)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    for location, error in failed:
+        print(f"FAILED {location}: {error}", file=sys.stderr)
+    print(f"{succeeded} locations, {rows_written} rows in {elapsed:.1f}s "
+          f"({succeeded / elapsed if elapsed else 0:.1f} locations/s), {len(failed)} failed", file=sys.stderr)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
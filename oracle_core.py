@@ -0,0 +1,760 @@
+import datetime as dt
+import heapq
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+from pytz import timezone
+
+import oracle_metrics
+from forecast_store import StoredForecast
+from gazetteer import DEFAULT_TIMEZONE, resolve_location
+from timeline_parser import TIMESTEP_SECONDS, merge_timelines, timelines_version
+from tomorrowio_client import TomorrowioError
+
+# Headless core of the Golf-able Oracle: fetch, parse, daylight filtering, golf-able windows and
+# per-day view models. Nothing here touches Streamlit, and plotly is only imported when a figure
+# is actually built, so batch jobs and worker processes can use it without the UI stack.
+
+# Zone for forecasts whose location the gazetteer could not place
+mst = timezone(DEFAULT_TIMEZONE)
+
+# Forecast request shape, shared with the cache key
+FORECAST_FIELDS = ["temperature", "temperatureMax", "precipitationProbability", "windSpeed", 
+                   "sunriseTime", "sunsetTime"]
+FORECAST_UNITS = "imperial"
+
+# Sub-daily resolution and horizon of a consultation; the daily timeline is always requested too
+DEFAULT_RESOLUTION = "1h"
+DEFAULT_HORIZON_DAYS = 5
+FORECAST_TIMESTEPS = ["1d", DEFAULT_RESOLUTION]
+
+# How far ahead tomorrow.io serves each timestep (plan dependent); horizons are clamped to these
+MAX_HORIZON_HOURS = {"1m": 6, "5m": 24, "15m": 24, "30m": 24, "1h": 360, "1d": 360}
+
+# Incremental refreshes fetch the next few hours again, since near-term forecasts change most, and
+# hours past the stored horizon only once enough of them are missing; everything between is kept
+DELTA_REVALIDATE_HOURS = 6
+DELTA_MIN_TAIL_HOURS = 6
+
+# The kept hours are only as current as the last full fetch, so once that is older than this a
+# refresh fetches the whole horizon again: (city, resolution, horizon days) -> when, per process
+DELTA_MAX_FULL_FETCH_AGE_HOURS = 3
+_full_fetch_times = {}
+_full_fetch_times_lock = threading.Lock()
+
+# Upper bound on simultaneous tomorrow.io fetches in multi-course mode
+MAX_CONCURRENT_FETCHES = 8
+
+# Golfability score: how far each hour is past (or short of) each threshold, in these units, weighted.
+# A margin of one full scale counts as ideal; golf-able hours score 0..1, the rest -1..0.
+SCORE_SCALES = {"temperature": 20.0, "wind_speed": 10.0, "precip_prob": 20.0}
+SCORE_WEIGHTS = {"temperature": 1.0, "wind_speed": 1.0, "precip_prob": 1.0}
+
+# Tee-time search: a round of golf, and how many options to offer
+TEE_TIME_HOURS = 4
+TOP_TEE_TIMES = 5
+
+# Per-day aggregates of a forecast under one set of thresholds
+DAILY_SUMMARY_COLUMNS = ["date", "weekday", "golfable_hours", "high_temp", "max_wind", "max_rain"]
+
+# Day views and figures kept per process, shared by every session and by successive versions of a
+# forecast: (day version, date, thresholds) -> view model / figure
+FIGURE_CACHE_SIZE = 256
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+DAY_VIEW_CACHE_SIZE = 256
+_day_view_cache = OrderedDict()
+_day_view_cache_lock = threading.Lock()
+
+# Layout keys of plotly_dark that a 2D line chart actually uses; the full template is ~8KB per figure
+_TEMPLATE_LAYOUT_KEYS = ("autotypenumbers", "colorway", "font", "hoverlabel", "hovermode", "paper_bgcolor",
+                         "plot_bgcolor", "xaxis", "yaxis", "shapedefaults", "title")
+_figure_template = None
+
+HIGHLIGHT_FILL = 'rgba(144, 238, 144, 0.3)'  # Light green with transparency
+
+
+def forecast_timesteps(resolution=DEFAULT_RESOLUTION):
+    return ["1d", resolution]
+
+
+def forecast_horizon_hours(resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS):
+    return min(horizon_days * 24, MAX_HORIZON_HOURS[resolution])
+
+
+def fetch_forecast(cache, client, city, resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS,
+                   archive=None):
+    # Cached per-timestep columns for a location; raises TomorrowioError when it cannot be fetched.
+    # cache is a ForecastCache, or a PrefetchScheduler in front of one for stale-while-revalidate.
+    # With an expired copy at hand only the changed hours are requested and merged into it.
+    # Every response actually fetched is appended to the ForecastArchive when one is given.
+    return cache.get_or_fetch(city, FORECAST_FIELDS, forecast_timesteps(resolution), FORECAST_UNITS,
+                              lambda: request_weather_forecast(client, city, resolution, horizon_days, archive),
+                              horizon=forecast_horizon_hours(resolution, horizon_days),
+                              update=lambda previous: request_forecast_update(client, city, previous,
+                                                                              resolution, horizon_days, archive))
+
+
+def request_timeline_window(client, city, resolution, start, end, archive=None):
+    params = {
+        "location": f"{city}",
+        "fields": FORECAST_FIELDS,
+        "units": FORECAST_UNITS,
+        "timesteps": forecast_timesteps(resolution),
+        "startTime": start.isoformat(),
+        "endTime": end.isoformat(),
+    }
+
+    # Interval counts are known up front, so the parser allocates every column once
+    seconds = int((end - start).total_seconds())
+    expected_sizes = {
+        "1d": seconds // 86400 + 2,
+        resolution: seconds // TIMESTEP_SECONDS[resolution] + 2,
+    }
+
+    with oracle_metrics.span("fetch"):
+        columns = client.get_timeline_columns(params, expected_sizes)
+
+    if archive is not None:
+        archive.append(city, columns, start)
+    return columns
+
+
+def request_weather_forecast(client, city, resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS,
+                             archive=None):
+    now = dt.datetime.now(dt.timezone.utc)
+    end = now + dt.timedelta(hours=forecast_horizon_hours(resolution, horizon_days))
+    columns = request_timeline_window(client, city, resolution, now, end, archive)
+    with _full_fetch_times_lock:
+        _full_fetch_times[(city, resolution, horizon_days)] = now
+    return columns
+
+
+def request_forecast_update(client, city, previous, resolution=DEFAULT_RESOLUTION,
+                            horizon_days=DEFAULT_HORIZON_DAYS, archive=None):
+    # Refresh a stored forecast: the next DELTA_REVALIDATE_HOURS again, plus the hours past its end
+    # once at least DELTA_MIN_TAIL_HOURS are missing. Short horizons, and forecasts whose last full
+    # fetch is unknown to this process or older than DELTA_MAX_FULL_FETCH_AGE_HOURS, are fetched in full
+    hours = forecast_horizon_hours(resolution, horizon_days)
+    timeline = previous.get(resolution)
+    now = dt.datetime.now(dt.timezone.utc)
+    with _full_fetch_times_lock:
+        full_fetched = _full_fetch_times.get((city, resolution, horizon_days))
+    if (hours <= DELTA_REVALIDATE_HOURS + DELTA_MIN_TAIL_HOURS or "1d" not in previous
+            or timeline is None or not len(timeline["startTime"]) or full_fetched is None
+            or now - full_fetched > dt.timedelta(hours=DELTA_MAX_FULL_FETCH_AGE_HOURS)):
+        return request_weather_forecast(client, city, resolution, horizon_days, archive)
+
+    end = now + dt.timedelta(hours=hours)
+    revalidate_end = now + dt.timedelta(hours=DELTA_REVALIDATE_HOURS)
+    stored_end = pd.Timestamp(timeline["startTime"][-1]).tz_localize("UTC").to_pydatetime()
+    if stored_end < revalidate_end:
+        return request_weather_forecast(client, city, resolution, horizon_days, archive)
+
+    updates = [request_timeline_window(client, city, resolution, now, revalidate_end)]
+    if end - stored_end >= dt.timedelta(hours=DELTA_MIN_TAIL_HOURS):
+        tail_start = stored_end + dt.timedelta(seconds=TIMESTEP_SECONDS[resolution])
+        updates.append(request_timeline_window(client, city, resolution, tail_start, end))
+
+    oracle_metrics.increment("delta_fetches")
+    with oracle_metrics.span("delta_merge"):
+        merged = merge_timelines(previous, updates)
+
+    # Archived as the whole forecast this refresh produced, not its windows, so a day's newest
+    # archived forecast is never just the slice a refresh happened to request
+    if archive is not None:
+        archive.append(city, merged, now)
+    return merged
+
+
+def sub_daily_timeline(timelines):
+    # The finer of the requested timelines, whatever its resolution
+    return min((ts for ts in timelines if ts != "1d"), key=lambda ts: TIMESTEP_SECONDS.get(ts, 0))
+
+
+def utc_index(times, tz):
+    # datetime64 UTC column -> tz-aware nanosecond index in the course's zone, one vectorized pass
+    return pd.DatetimeIndex(times).as_unit("ns").tz_localize("UTC").tz_convert(tz)
+
+
+def forecast_frame(columns, tz=mst):
+    # Sub-daily timeline columns -> the forecast frame; the arrays are already typed
+    forecast_df = pd.DataFrame({
+        "datetime": utc_index(columns["startTime"], tz),
+        "temperature": columns["temperature"],
+        "wind_speed": columns["windSpeed"],
+        "precip_prob": columns["precipitationProbability"],
+    })
+
+    # Local calendar day of each hour, kept as a tz-aware midnight timestamp
+    forecast_df.insert(1, "date", forecast_df["datetime"].dt.normalize())
+
+    return forecast_df
+
+
+def daylight_index(daily_columns, tz=mst):
+    # One sunrise/sunset pair per local calendar day, taken from the 1d timeline
+    sunrise = utc_index(daily_columns["sunriseTime"], tz)
+    sunset = utc_index(daily_columns["sunsetTime"], tz)
+
+    daylight_df = pd.DataFrame({"date": sunrise.normalize(), "sunrise": sunrise, "sunset": sunset})
+
+    return daylight_df.sort_values(by="sunrise").drop_duplicates(subset="date").reset_index(drop=True)
+
+
+def filter_forecast_by_sunrise_sunset(forecast_df, daylight_df):
+    times = forecast_df["datetime"].to_numpy(dtype="datetime64[ns]")
+    sunrises = daylight_df["sunrise"].to_numpy(dtype="datetime64[ns]")
+    sunsets = daylight_df["sunset"].to_numpy(dtype="datetime64[ns]")
+
+    # Latest sunrise at or before each forecast hour; hours before the first sunrise get -1
+    day_idx = np.searchsorted(sunrises, times, side="right") - 1
+    has_sunrise = day_idx >= 0
+
+    # Keep the hours between that sunrise and the same day's sunset
+    daylight = has_sunrise & (times <= sunsets[np.where(has_sunrise, day_idx, 0)])
+
+    return forecast_df[daylight].reset_index(drop=True)
+
+
+def forecast_version(data):
+    # Content hash of the forecast, so every session that parses the same forecast shares its figures
+    return timelines_version(data)
+
+
+def local_today(tz=mst):
+    return pd.Timestamp.now(tz=tz).date()
+
+
+def daily_values_by_date(daily_columns, tz=mst):
+    # The 1d timeline as date -> the values the day view shows
+    sunrises = utc_index(daily_columns["sunriseTime"], tz)
+    sunsets = utc_index(daily_columns["sunsetTime"], tz)
+
+    days = {}
+    # Daily intervals start at 6am local, so their local date is the forecast day
+    for i, start in enumerate(utc_index(daily_columns["startTime"], tz)):
+        days.setdefault(start.date(), {
+            "temperatureMax": float(daily_columns["temperatureMax"][i]),
+            "windSpeed": float(daily_columns["windSpeed"][i]),
+            "precipitationProbability": float(daily_columns["precipitationProbability"][i]),
+            "sunriseTime": sunrises[i],
+            "sunsetTime": sunsets[i],
+        })
+    return days
+
+
+def store_forecast(data, tz=mst):
+    # The immutable, shareable part of a parsed forecast
+    resolution = sub_daily_timeline(data)
+    with oracle_metrics.span("parse"):
+        forecast_df = forecast_frame(data[resolution], tz)
+
+    # Keep the daylight hours of every forecast day
+    with oracle_metrics.span("daylight_filter"):
+        filtered_forecast = filter_forecast_by_sunrise_sunset(forecast_df, daylight_index(data["1d"], tz))
+
+    return StoredForecast(filtered_forecast, daily_values_by_date(data["1d"], tz), threshold_sort_orders(filtered_forecast))
+
+
+def parse_forecast(city, data, tz=mst, store=None):
+    # Parse once per consultation; threshold edits and day switches reuse the result.
+    # tz is the course's resolved zone; every timestamp is converted into it column-wise.
+    # With a ForecastStore, sessions looking at the same forecast share one parsed copy and only
+    # keep their own threshold masks and day views.
+    version = forecast_version(data)
+    if store is not None:
+        stored = store.get_or_build((version, str(tz)), lambda: store_forecast(data, tz))
+    else:
+        stored = store_forecast(data, tz)
+
+    return {
+        "city": city,
+        "timezone": tz,
+        "resolution": sub_daily_timeline(data),
+        "version": version,
+        "stored": stored,
+        "filtered_forecast": stored.frame,
+        "threshold_index": ThresholdIndex(stored.frame, stored.sorted_columns),
+    }
+
+
+def golfable_mask(forecast_df, min_temp, max_wind, max_rain):
+    # One boolean per forecast hour: does it meet every golf-able threshold
+    return (
+        (forecast_df['temperature'].to_numpy() >= min_temp) &
+        (forecast_df['wind_speed'].to_numpy() <= max_wind) &
+        (forecast_df['precip_prob'].to_numpy() <= max_rain)
+    )
+
+
+def threshold_sort_orders(forecast_df):
+    sorted_columns = {}
+    for column in ('temperature', 'wind_speed', 'precip_prob'):
+        values = forecast_df[column].to_numpy()
+        order = np.argsort(values, kind='stable')
+        # NaN sorts last and never meets a threshold
+        valid = np.count_nonzero(~np.isnan(values))
+        sorted_columns[column] = (order[:valid], values[order[:valid]])
+    return sorted_columns
+
+
+class ThresholdIndex:
+    # Per-hour sort orders of each weather column, built once per parsed forecast, so a
+    # threshold edit is a binary search plus a scatter instead of a full comparison pass.
+    # The last mask of every column and the last windows are kept, so moving one slider
+    # only re-evaluates that slider's column.
+
+    def __init__(self, forecast_df, sorted_columns=None):
+        self.forecast_df = forecast_df
+        self.size = len(forecast_df)
+        self._sorted = sorted_columns if sorted_columns is not None else threshold_sort_orders(forecast_df)
+        self._masks = {}
+        self._windows = None
+
+    def _column_mask(self, column, threshold, keep_above):
+        cached = self._masks.get(column)
+        if cached is not None and cached[0] == threshold:
+            return cached[1]
+
+        order, sorted_values = self._sorted[column]
+        mask = np.zeros(self.size, dtype=bool)
+        if keep_above:
+            mask[order[np.searchsorted(sorted_values, threshold, side='left'):]] = True
+        else:
+            mask[order[:np.searchsorted(sorted_values, threshold, side='right')]] = True
+
+        self._masks[column] = (threshold, mask)
+        return mask
+
+    def mask(self, min_temp, max_wind, max_rain):
+        return (
+            self._column_mask('temperature', min_temp, keep_above=True) &
+            self._column_mask('wind_speed', max_wind, keep_above=False) &
+            self._column_mask('precip_prob', max_rain, keep_above=False)
+        )
+
+    def windows(self, min_temp, max_wind, max_rain):
+        thresholds = (min_temp, max_wind, max_rain)
+        if self._windows is None or self._windows[0] != thresholds:
+            with oracle_metrics.span("window_detection"):
+                self._windows = (thresholds, golfable_windows(self.forecast_df, self.mask(*thresholds)))
+        return self._windows[1]
+
+
+def golfable_windows(forecast_df, golfable, max_gap=pd.Timedelta(hours=1)):
+    # Run-length encode the golf-able mask into contiguous windows for the whole horizon at once.
+    # A row extends the previous window when both are golf-able, fall on the same local day
+    # and are no more than max_gap apart.
+    golfable = np.asarray(golfable, dtype=bool)
+    times = forecast_df['datetime'].to_numpy(dtype='datetime64[ns]')
+    days = forecast_df['date'].to_numpy(dtype='datetime64[ns]')
+
+    continues = np.zeros(len(golfable), dtype=bool)
+    continues[1:] = (
+        golfable[1:] & golfable[:-1] &
+        (days[1:] == days[:-1]) &
+        (np.diff(times) <= max_gap.to_timedelta64())
+    )
+
+    start_idx = np.flatnonzero(golfable & ~continues)
+    end_idx = np.flatnonzero(golfable & ~np.append(continues[1:], False))
+
+    start_times = forecast_df['datetime'].iloc[start_idx].reset_index(drop=True)
+    end_times = forecast_df['datetime'].iloc[end_idx].reset_index(drop=True)
+
+    return pd.DataFrame({
+        'day': forecast_df['date'].iloc[start_idx].reset_index(drop=True),
+        'start_time': start_times,
+        'end_time': end_times,
+        'hours': (end_times - start_times).dt.total_seconds() / 3600,
+    })
+
+
+def golfable_hours_per_day(forecast_df, windows):
+    # Sum window lengths per local day; days without a window count as 0
+    days = forecast_df['date'].drop_duplicates().reset_index(drop=True)
+    day_codes = np.searchsorted(days.to_numpy(dtype='datetime64[ns]'), windows['day'].to_numpy(dtype='datetime64[ns]'))
+    totals = np.bincount(day_codes, weights=windows['hours'].to_numpy(), minlength=len(days))
+
+    return {day.date(): round(total) for day, total in zip(days, totals)}
+
+
+def daily_summary(daily_values, golfable_hours):
+    # One row per forecast day, for the metrics strip and anything else showing the days side by side
+    dates = sorted(daily_values)
+    return pd.DataFrame({
+        'date': dates,
+        'weekday': [day.strftime('%A') for day in dates],
+        'golfable_hours': [golfable_hours.get(day, 0) for day in dates],
+        'high_temp': [daily_values[day]['temperatureMax'] for day in dates],
+        'max_wind': [daily_values[day]['windSpeed'] for day in dates],
+        'max_rain': [daily_values[day]['precipitationProbability'] for day in dates],
+    }, columns=DAILY_SUMMARY_COLUMNS)
+
+
+def golfable_hrs_each_day(filtered_forecast, min_temp, max_wind, max_rain, windows=None):
+    df = filtered_forecast
+
+    if windows is None:
+        windows = golfable_windows(df, golfable_mask(df, min_temp, max_wind, max_rain))
+
+    return golfable_hours_per_day(df, windows)
+
+
+def golfability_score(forecast_df, min_temp, max_wind, max_rain, weights=None):
+    # Continuous version of golfable_mask, one vectorized pass over the whole horizon: score >= 0
+    # exactly where the mask is true. Golf-able hours score the weighted mean of their margins,
+    # the others the weighted mean of their shortfalls, so a near miss ranks above a washout.
+    weights = weights or SCORE_WEIGHTS
+    margins = np.stack([
+        (forecast_df['temperature'].to_numpy(dtype=np.float64) - min_temp) / SCORE_SCALES['temperature'],
+        (max_wind - forecast_df['wind_speed'].to_numpy(dtype=np.float64)) / SCORE_SCALES['wind_speed'],
+        (max_rain - forecast_df['precip_prob'].to_numpy(dtype=np.float64)) / SCORE_SCALES['precip_prob'],
+    ])
+    # Missing values never meet a threshold
+    margins = np.clip(np.nan_to_num(margins, nan=-1.0), -1.0, 1.0)
+    w = np.array([weights['temperature'], weights['wind_speed'], weights['precip_prob']])[:, None] / \
+        sum(weights.values())
+
+    passing = (margins >= 0).all(axis=0)
+    return np.where(passing, (w * margins).sum(axis=0), (w * np.minimum(margins, 0)).sum(axis=0))
+
+
+def top_tee_windows(forecast_df, min_temp, max_wind, max_rain, duration_hours=TEE_TIME_HOURS, k=TOP_TEE_TIMES,
+                    weights=None):
+    # The k best non-overlapping windows of duration_hours across every day, ranked by mean score.
+    # A window must be golf-able throughout, contiguous and within one local day. Every candidate
+    # start is scored at once with prefix sums, then the best are taken in score order.
+    columns = ['day', 'start_time', 'end_time', 'score']
+    times = forecast_df['datetime'].to_numpy(dtype='datetime64[ns]')
+    if len(times) < 2:
+        return pd.DataFrame(columns=columns)
+
+    step = np.median(np.diff(times))
+    width = int(round(np.timedelta64(int(duration_hours * 3600), 's') / step))
+    count = len(times) - width + 1
+    if width < 1 or count < 1:
+        return pd.DataFrame(columns=columns)
+
+    score = golfability_score(forecast_df, min_temp, max_wind, max_rain, weights)
+    sums = np.concatenate(([0.0], np.cumsum(score)))
+    misses = np.concatenate(([0], np.cumsum(score < 0)))
+    days = forecast_df['date'].to_numpy(dtype='datetime64[ns]')
+
+    starts = np.arange(count)
+    last = starts + width - 1
+    valid = (
+        (misses[starts + width] == misses[starts]) &
+        (days[last] == days[starts]) &
+        (times[last] - times[starts] == (width - 1) * step)
+    )
+    window_scores = (sums[starts + width] - sums[starts]) / width
+
+    # Best first; overlapping shifts of an already chosen window are skipped
+    candidates = np.flatnonzero(valid)
+    candidates = candidates[np.argsort(-window_scores[candidates], kind='stable')]
+    taken = np.zeros(len(times), dtype=bool)
+    chosen = []
+    for start in candidates:
+        if taken[start:start + width].any():
+            continue
+        taken[start:start + width] = True
+        chosen.append(start)
+        if len(chosen) == k:
+            break
+
+    chosen = np.array(chosen, dtype=int)
+    start_times = forecast_df['datetime'].iloc[chosen].reset_index(drop=True)
+    return pd.DataFrame({
+        'day': forecast_df['date'].iloc[chosen].reset_index(drop=True),
+        'start_time': start_times,
+        'end_time': start_times + pd.Timedelta(hours=duration_hours),
+        'score': window_scores[chosen],
+    })
+
+
+def best_tee_windows(forecasts, min_temp, max_wind, max_rain, duration_hours=TEE_TIME_HOURS, k=TOP_TEE_TIMES,
+                     weights=None):
+    # Top k tee windows across many courses: each course's own top k, merged with a heap
+    # forecasts: course name -> parsed forecast (parse_forecast)
+    candidates = []
+    for course, forecast in forecasts.items():
+        windows = top_tee_windows(forecast["filtered_forecast"], min_temp, max_wind, max_rain,
+                                  duration_hours, k, weights)
+        candidates.extend((score, course, start, end)
+                          for score, start, end in zip(windows['score'], windows['start_time'], windows['end_time']))
+
+    best = heapq.nlargest(k, candidates, key=lambda candidate: candidate[0])
+    return pd.DataFrame([{"course": course, "start_time": start, "end_time": end, "score": score}
+                         for score, course, start, end in best], columns=["course", "start_time", "end_time", "score"])
+
+
+def figure_template():
+    # Built once per process: plotly_dark trimmed to what the forecast chart uses
+    global _figure_template
+    if _figure_template is None:
+        import plotly.graph_objects as go
+        import plotly.io as pio
+
+        dark = pio.templates['plotly_dark']
+        layout = {key: dark.layout[key] for key in _TEMPLATE_LAYOUT_KEYS}
+        _figure_template = go.layout.Template(layout=layout, data={'scatter': dark.data.scatter})
+    return _figure_template
+
+
+def build_forecast_figure(daily_df, highlight_ranges_df, time_label='Time (MST)'):
+    # Imported here so the rest of the core never loads plotly
+    import plotly.graph_objects as go
+
+    # One line per metric straight from the columns, no melt
+    x = daily_df['time_display'].tolist()
+    traces = [
+        go.Scatter(x=x, y=daily_df[column].tolist(), name=column, mode='lines+markers',
+                   hovertemplate='%{y}')
+        for column in ('precip_prob', 'temperature', 'wind_speed')
+    ]
+
+    # Shaded areas for each continuous time range, set in one layout update
+    shapes = [
+        dict(type='rect', x0=start, x1=end, y0=0, y1=1, xref='x', yref='paper',
+             fillcolor=HIGHLIGHT_FILL, line=dict(width=1))
+        for start, end in zip(highlight_ranges_df['start_hour'], highlight_ranges_df['end_hour'])
+    ]
+
+    fig = go.Figure(data=traces)
+    fig.update_layout(
+        title='Weather Metrics Over Time',
+        xaxis_title=time_label,
+        yaxis_title='Value (°F, mph, %)',
+        legend_title='Metrics',
+        template=figure_template(),
+        hovermode='x unified',
+        shapes=shapes,
+    )
+
+    return fig
+
+
+def day_figure(day_view):
+    # Figures are built on first view and reused for any session showing the same forecast day
+    key = day_view["figure_key"]
+    with _figure_cache_lock:
+        fig = _figure_cache.get(key)
+        if fig is not None:
+            _figure_cache.move_to_end(key)
+            oracle_metrics.increment("figure_cache_hits")
+            return fig
+
+    with oracle_metrics.span("figure_build"):
+        fig = build_forecast_figure(day_view["daily_df"], day_view["highlight_ranges_df"], day_view["time_label"])
+
+    with _figure_cache_lock:
+        _figure_cache[key] = fig
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return fig
+
+
+def clear_figure_cache():
+    with _figure_cache_lock:
+        _figure_cache.clear()
+
+
+def cached_day_view(key, build):
+    # Days whose rows and thresholds are unchanged keep their view across forecast refreshes
+    with _day_view_cache_lock:
+        day_view = _day_view_cache.get(key)
+        if day_view is not None:
+            _day_view_cache.move_to_end(key)
+            oracle_metrics.increment("day_view_cache_hits")
+            return day_view
+
+    day_view = build()
+
+    with _day_view_cache_lock:
+        _day_view_cache[key] = day_view
+        while len(_day_view_cache) > DAY_VIEW_CACHE_SIZE:
+            _day_view_cache.popitem(last=False)
+    return day_view
+
+
+def clear_day_view_cache():
+    with _day_view_cache_lock:
+        _day_view_cache.clear()
+
+
+def build_day_view(daily_values, forecast_date, daily_df, windows, min_temp, max_wind, max_rain,
+                   day_version=None):
+    # Everything the page shows for one day, so switching days needs no pandas or plotting work.
+    # daily_df is the stored, read-only slice of the day's daylight rows with their time labels.
+    daily_high = daily_values["temperatureMax"]
+    daily_max_wind = daily_values["windSpeed"]
+    daily_max_precip = daily_values["precipitationProbability"]
+
+    # Step 1: Sunrise and sunset, already in the course's zone
+    sunrise_dt_local = daily_values["sunriseTime"]
+    sunset_dt_local = daily_values["sunsetTime"]
+    tz = sunrise_dt_local.tz
+
+    # Steps 2-3: the selected local day's rows and AM/PM labels come prebuilt from the store
+    day_start = pd.Timestamp(forecast_date).tz_localize(tz)
+
+    # Step 4: Keep the golf-able windows on the selected day
+    highlight_ranges_df = windows[windows['day'] == day_start].reset_index(drop=True)
+    highlight_ranges_df['start_date'] = highlight_ranges_df['start_time'].dt.date
+    highlight_ranges_df['start_hour'] = highlight_ranges_df['start_time'].dt.strftime('%I:%M %p')
+    highlight_ranges_df['end_hour'] = highlight_ranges_df['end_time'].dt.strftime('%I:%M %p')
+
+    # Zone abbreviation of the day for the time axis, e.g. MDT or BST
+    zone_name = sunrise_dt_local.strftime('%Z') or str(tz)
+
+    # Step 5: Round the window lengths to whole numbers for the prophecy
+    # A day can pass on its daily values with no golf-able daylight hour, which leaves no windows at all
+    if highlight_ranges_df.empty:
+        total_hours_string = "0"
+    else:
+        total_hours_string = highlight_ranges_df['hours'].round().astype(int).astype(str).to_string(index=False)
+
+    return {
+        "date": forecast_date,
+        "daily_high": daily_high,
+        "daily_max_wind": daily_max_wind,
+        "daily_max_precip": daily_max_precip,
+        "temp_diff": daily_high - min_temp,
+        "wind_diff": daily_max_wind - max_wind,
+        "rain_diff": daily_max_precip - max_rain,
+        "sunrise": sunrise_dt_local,
+        "sunset": sunset_dt_local,
+        "time_label": f"Time ({zone_name})",
+        "daily_df": daily_df,
+        "highlight_ranges_df": highlight_ranges_df,
+        "total_hours_string": total_hours_string,
+        "figure_key": (day_version, forecast_date, (min_temp, max_wind, max_rain)),
+    }
+
+
+def tee_time_rows(tee_times):
+    # Display rows for a tee time table, formatted per value since courses in different zones
+    # leave the time columns without a common dtype
+    has_course = "course" in tee_times
+    return [
+        {
+            **({"Course": row.course} if has_course else {}),
+            "Day": row.start_time.strftime('%a %m-%d'),
+            "Tee Time": row.start_time.strftime('%I:%M %p'),
+            "Done By": row.end_time.strftime('%I:%M %p'),
+            "Score": round(float(row.score), 2),
+        }
+        for row in tee_times.itertuples(index=False)
+    ]
+
+
+def build_day_views(forecast, min_temp, max_wind, max_rain):
+    # View models for every forecast day, rebuilt only when the forecast or the thresholds change
+    thresholds = (min_temp, max_wind, max_rain)
+    day_views = forecast.get("day_views")
+    if day_views is not None and day_views["thresholds"] == thresholds:
+        return day_views
+
+    stored = forecast["stored"]
+    filtered_forecast = forecast["filtered_forecast"]
+    windows = forecast["threshold_index"].windows(min_temp, max_wind, max_rain)
+
+    days = {}
+    for forecast_date, daily_values in stored.daily_values.items():
+        day_version = stored.day_versions.get(forecast_date)
+        days[forecast_date] = cached_day_view(
+            (day_version, forecast_date, thresholds),
+            lambda: build_day_view(daily_values, forecast_date, stored.day_frame(forecast_date), windows,
+                                   min_temp, max_wind, max_rain, day_version))
+
+    golfable_hours = golfable_hours_per_day(filtered_forecast, windows)
+    summary = daily_summary(stored.daily_values, golfable_hours)
+
+    tee_times = top_tee_windows(filtered_forecast, min_temp, max_wind, max_rain)
+
+    forecast["day_views"] = {
+        "thresholds": thresholds,
+        "days": days,
+        "golfable_hours": golfable_hours,
+        "daily_summary": summary,
+        # The same rows as plain dicts, so rendering the strip does no pandas work
+        "week_strip": summary.to_dict("records"),
+        "tee_times": tee_times,
+        # Formatted once here, so a day switch re-renders the table without touching pandas
+        "tee_time_rows": tee_time_rows(tee_times),
+    }
+    return forecast["day_views"]
+
+
+def load_course(cache, client, city, resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS,
+                store=None, archive=None):
+    place = resolve_location(city)
+    data = fetch_forecast(cache, client, place["query"], resolution, horizon_days, archive)
+    return parse_forecast(city, data, place["timezone"], store)
+
+
+def forecast_course(cache, client, city, min_temp, max_wind, max_rain,
+                    resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS, store=None, archive=None):
+    forecast = load_course(cache, client, city, resolution, horizon_days, store, archive)
+
+    windows = forecast["threshold_index"].windows(min_temp, max_wind, max_rain)
+    return golfable_hours_per_day(forecast["filtered_forecast"], windows)
+
+
+def rank_courses(cache, client, cities, min_temp, max_wind, max_rain, max_workers=MAX_CONCURRENT_FETCHES,
+                 resolution=DEFAULT_RESOLUTION, horizon_days=DEFAULT_HORIZON_DAYS, store=None, archive=None):
+    rows = []
+    failed = []
+
+    # Every course is fetched at once, bounded by the pool size, so latency is close to a single fetch
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cities)))) as executor:
+        futures = {
+            executor.submit(forecast_course, cache, client, city, min_temp, max_wind, max_rain,
+                            resolution, horizon_days, store, archive): city
+            for city in cities
+        }
+        for future in as_completed(futures):
+            city = futures[future]
+            try:
+                daily_hours = future.result()
+            except (TomorrowioError, KeyError, IndexError):
+                failed.append(city)
+                continue
+            for day, hours in daily_hours.items():
+                rows.append({"Course": city, "day": day, "hours": hours})
+
+    if not rows:
+        return pd.DataFrame(), failed
+
+    ranking_df = pd.DataFrame(rows).pivot(index='Course', columns='day', values='hours').fillna(0).astype(int)
+    ranking_df.columns = [pd.Timestamp(day).strftime('%a %m-%d') for day in ranking_df.columns]
+    ranking_df['Total'] = ranking_df.sum(axis=1)
+    ranking_df = ranking_df.sort_values(by='Total', ascending=False)
+    ranking_df.insert(0, 'Rank', range(1, len(ranking_df) + 1))
+
+    return ranking_df, failed
+
+
+def rank_tee_times(cache, client, cities, min_temp, max_wind, max_rain, duration_hours=TEE_TIME_HOURS,
+                   k=TOP_TEE_TIMES, max_workers=MAX_CONCURRENT_FETCHES, resolution=DEFAULT_RESOLUTION,
+                   horizon_days=DEFAULT_HORIZON_DAYS, store=None, archive=None):
+    # Best tee windows over every course; after rank_courses these are cache and store hits
+    forecasts = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(cities)))) as executor:
+        futures = {
+            executor.submit(load_course, cache, client, city, resolution, horizon_days, store, archive): city
+            for city in cities
+        }
+        for future in as_completed(futures):
+            try:
+                forecasts[futures[future]] = future.result()
+            except (TomorrowioError, KeyError, IndexError):
+                continue
+
+    return best_tee_windows(forecasts, min_temp, max_wind, max_rain, duration_hours, k)
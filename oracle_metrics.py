@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+
+# Lightweight, process-wide instrumentation for the oracle hot path.
+#
+#   with oracle_metrics.span("fetch"):
+#       ...
+#   oracle_metrics.increment("api_calls")
+#
+# Spans only record while collection is enabled: always with ORACLE_METRICS=1 or enable(), and
+# otherwise while at least one viewer (a session with the debug panel open) has asked for them
+# through set_viewing(). When disabled span() hands back one shared no-op context manager, so
+# instrumented code pays a function call and nothing else. Counters are plain integer adds and
+# always count.
+
+ENV_ENABLED = os.environ.get("ORACLE_METRICS", "").lower() in ("1", "true", "yes", "on")
+
+# A viewer that stops checking in (a tab closed with the panel open) no longer counts after this
+VIEWER_TIMEOUT_SECONDS = 15 * 60
+
+_forced = ENV_ENABLED
+_enabled = _forced
+# viewer -> when it last asked for spans
+_viewers = {}
+_lock = threading.Lock()
+
+# stage -> [count, total seconds, max seconds, last seconds]
+_stages = {}
+_counters = {}
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enable(enabled=True):
+    # Process-wide switch, independent of viewers
+    global _forced, _enabled
+    with _lock:
+        _forced = enabled
+        _enabled = _forced or bool(_viewers)
+
+
+def set_viewing(viewer, viewing, now=None):
+    # Collect spans while any viewer wants them, rather than letting the last caller decide
+    global _enabled
+    now = time.time() if now is None else now
+    with _lock:
+        if viewing:
+            _viewers[viewer] = now
+        else:
+            _viewers.pop(viewer, None)
+        for expired in [v for v, seen in _viewers.items() if now - seen > VIEWER_TIMEOUT_SECONDS]:
+            del _viewers[expired]
+        _enabled = _forced or bool(_viewers)
+
+
+def is_enabled():
+    return _enabled
+
+
+def span(name):
+    return _Span(name) if _enabled else _NULL_SPAN
+
+
+def observe(name, seconds):
+    with _lock:
+        stage = _stages.get(name)
+        if stage is None:
+            _stages[name] = [1, seconds, seconds, seconds]
+        else:
+            stage[0] += 1
+            stage[1] += seconds
+            stage[2] = max(stage[2], seconds)
+            stage[3] = seconds
+
+
+def increment(name, value=1):
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def reset():
+    with _lock:
+        _stages.clear()
+        _counters.clear()
+
+
+def snapshot():
+    with _lock:
+        return {
+            "stages": {
+                name: {"count": count, "total_s": total, "max_s": maximum, "last_s": last,
+                       "mean_s": total / count}
+                for name, (count, total, maximum, last) in _stages.items()
+            },
+            "counters": dict(_counters),
+        }
+
+
+def prometheus_text(prefix="oracle"):
+    # Prometheus text exposition format, suitable for a scrape endpoint or a file drop
+    current = snapshot()
+    lines = []
+
+    if current["stages"]:
+        lines.append(f"# HELP {prefix}_stage_seconds Wall time spent in each oracle stage.")
+        lines.append(f"# TYPE {prefix}_stage_seconds summary")
+        for name, stage in sorted(current["stages"].items()):
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{name}"}} {stage["total_s"]:.6f}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{name}"}} {stage["count"]}')
+        lines.append(f"# HELP {prefix}_stage_seconds_max Slowest observation of each oracle stage.")
+        lines.append(f"# TYPE {prefix}_stage_seconds_max gauge")
+        for name, stage in sorted(current["stages"].items()):
+            lines.append(f'{prefix}_stage_seconds_max{{stage="{name}"}} {stage["max_s"]:.6f}')
+
+    for name, value in sorted(current["counters"].items()):
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+
+    return "\n".join(lines) + "\n"
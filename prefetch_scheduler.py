@@ -0,0 +1,267 @@
+import heapq
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import oracle_metrics
+
+# Background refresh of popular forecasts, with stale-while-revalidate.
+#
+#   scheduler = PrefetchScheduler(cache, top_n=20, max_prefetches_per_hour=120).start()
+#   payload = scheduler.get_or_fetch(location, fields, timesteps, units, fetch, horizon)
+#
+# Every consultation goes through get_or_fetch, which counts how often each location is asked for.
+# Once a minute the hottest top_n locations whose cached forecast is about to expire (TTL or hour
+# bucket) are fetched again, at most max_prefetches_per_hour in any hour. A consultation that finds
+# only an expired forecast gets it straight away while one background refresh replaces it, so popular
+# courses only ever pay for a cache hit. Only a location never seen, or not seen for longer than the
+# cache's stale window, waits for tomorrow.io. Revalidations stand in for the fetch the consultation
+# would have made anyway, so only prefetches count against the hourly budget. Sessions that miss the
+# same cold location together share one fetch, which is stored, archived and announced once.
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_N = 20
+DEFAULT_MAX_PREFETCHES_PER_HOUR = 120
+
+# How long before expiry a popular forecast is refreshed, and how often that is checked
+DEFAULT_REFRESH_AHEAD_SECONDS = 5 * 60
+DEFAULT_INTERVAL_SECONDS = 60
+
+# Request counts halve every hour, so yesterday's rush does not outrank today's
+DEFAULT_HALF_LIFE_SECONDS = 60 * 60
+
+# Decayed request count below which a location is not worth prefetching (about one in the last hour)
+MIN_PREFETCH_SCORE = 0.5
+
+# Locations whose popularity is tracked; the coldest are forgotten beyond this
+MAX_TRACKED_LOCATIONS = 1024
+
+REFRESH_WORKERS = 2
+
+SECONDS_PER_HOUR = 3600
+
+
+class _Tracked:
+    __slots__ = ("request", "fetch", "update", "score", "seen")
+
+    def __init__(self, request, fetch, update, now):
+        self.request = request
+        self.fetch = fetch
+        self.update = update
+        self.score = 0.0
+        self.seen = now
+
+
+class PrefetchScheduler:
+    def __init__(self, cache, top_n=DEFAULT_TOP_N, max_prefetches_per_hour=DEFAULT_MAX_PREFETCHES_PER_HOUR,
+                 refresh_ahead_seconds=DEFAULT_REFRESH_AHEAD_SECONDS, interval_seconds=DEFAULT_INTERVAL_SECONDS,
+                 half_life_seconds=DEFAULT_HALF_LIFE_SECONDS, on_refresh=None):
+        self.cache = cache
+        self.top_n = top_n
+        self.max_prefetches_per_hour = max_prefetches_per_hour
+        self.refresh_ahead_seconds = refresh_ahead_seconds
+        self.interval_seconds = interval_seconds
+        self.half_life_seconds = half_life_seconds
+        # Called as on_refresh(location, payload) after every fetch, e.g. to evaluate watchlists
+        self.on_refresh = on_refresh
+
+        # base cache key -> _Tracked
+        self._tracked = {}
+        # base cache keys with a refresh queued or running, so each is fetched once at a time
+        self._refreshing = set()
+        # Start times of prefetches in the last hour, for the quota
+        self._prefetch_times = deque()
+        self._lock = threading.Lock()
+
+        self._executor = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix="oracle-refresh")
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.stale_served = 0
+        self.revalidations = 0
+        self.prefetches = 0
+        self.skipped_for_quota = 0
+        self.errors = 0
+
+    def get_or_fetch(self, location, fields, timesteps, units, fetch, horizon=None, update=None):
+        # Same contract as ForecastCache.get_or_fetch; refreshes use update(previous) when given
+        now = time.time()
+        key = self.cache.make_key(location, fields, timesteps, units, horizon, now)
+        self._record(key[0], (location, fields, timesteps, units, horizon), fetch, update, now)
+
+        payload = self.cache.get(key, now)
+        if payload is not None:
+            return payload
+
+        stale = self.cache.get_stale(key, now)
+        if stale is not None:
+            created, payload = stale
+            # The newest copy may be a prefetch stored in the next hour's bucket, which is still fresh
+            if now - created > self.cache.ttl_seconds:
+                with self._lock:
+                    self.stale_served += 1
+                oracle_metrics.increment("stale_served")
+                self._submit(key[0], revalidation=True)
+            return payload
+
+        def fetch_and_store():
+            # Only the caller that really fetched stores and notifies; the others share its payload
+            payload = self.cache.peek(key)
+            if payload is not None:
+                return payload
+            payload = fetch()
+            # Failed fetches are not cached so the next consultation tries again
+            if payload is not None:
+                self.cache.set(key, payload, now)
+                self._notify(location, payload)
+            return payload
+
+        return self.cache.single_flight(key, fetch_and_store)
+
+    def _record(self, base_key, request, fetch, update, now):
+        with self._lock:
+            tracked = self._tracked.get(base_key)
+            if tracked is None:
+                tracked = self._tracked[base_key] = _Tracked(request, fetch, update, now)
+                if len(self._tracked) > MAX_TRACKED_LOCATIONS:
+                    coldest = min(self._tracked, key=lambda k: self._decayed(self._tracked[k], now))
+                    del self._tracked[coldest]
+            # The latest fetch wins so refreshes use the current client and settings
+            tracked.fetch = fetch
+            tracked.update = update
+            tracked.score = self._decayed(tracked, now) + 1
+            tracked.seen = now
+
+    def _decayed(self, tracked, now):
+        return tracked.score * 0.5 ** ((now - tracked.seen) / self.half_life_seconds)
+
+    def hottest(self, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            ranked = heapq.nlargest(self.top_n, self._tracked.items(), key=lambda item: self._decayed(item[1], now))
+        return [(base_key, self._decayed(tracked, now)) for base_key, tracked in ranked]
+
+    def run_once(self, now=None):
+        # Queue refreshes for the hottest locations expiring within refresh_ahead_seconds
+        now = time.time() if now is None else now
+        queued = 0
+        for base_key, score in self.hottest(now):
+            if score < MIN_PREFETCH_SCORE or not self._due(base_key, now):
+                continue
+            with self._lock:
+                while self._prefetch_times and self._prefetch_times[0] <= now - SECONDS_PER_HOUR:
+                    self._prefetch_times.popleft()
+                if len(self._prefetch_times) >= self.max_prefetches_per_hour:
+                    self.skipped_for_quota += 1
+                    oracle_metrics.increment("prefetch_skipped_for_quota")
+                    continue
+                self._prefetch_times.append(now)
+            if self._submit(base_key, revalidation=False):
+                queued += 1
+        return queued
+
+    def _due(self, base_key, now):
+        with self._lock:
+            tracked = self._tracked.get(base_key)
+            if tracked is None or base_key in self._refreshing:
+                return False
+            location, fields, timesteps, units, horizon = tracked.request
+
+        # Whatever this location will be asked for a little from now has to be fresh by then
+        ahead = now + self.refresh_ahead_seconds
+        key = self.cache.make_key(location, fields, timesteps, units, horizon, ahead)
+        created = self.cache.created_at(key)
+        return created is None or ahead - created > self.cache.ttl_seconds
+
+    def _submit(self, base_key, revalidation):
+        with self._lock:
+            if base_key in self._refreshing or base_key not in self._tracked:
+                return False
+            self._refreshing.add(base_key)
+        self._executor.submit(self._refresh, base_key, revalidation)
+        return True
+
+    def _refresh(self, base_key, revalidation):
+        try:
+            with self._lock:
+                tracked = self._tracked.get(base_key)
+            if tracked is None:
+                return
+            location, fields, timesteps, units, horizon = tracked.request
+
+            # Refreshed from the newest stored copy when there is one, so only changed hours are fetched
+            previous = None
+            if tracked.update is not None:
+                previous = self.cache.get_stale(self.cache.make_key(location, fields, timesteps, units, horizon))
+            with oracle_metrics.span("revalidate" if revalidation else "prefetch"):
+                payload = tracked.update(previous[1]) if previous is not None else tracked.fetch()
+            if payload is None:
+                return
+
+            # A prefetch close to the hour stores into the bucket that is about to start
+            now = time.time()
+            ahead = now if revalidation else now + self.refresh_ahead_seconds
+            self.cache.set(self.cache.make_key(location, fields, timesteps, units, horizon, ahead), payload, now)
+            self._notify(location, payload)
+
+            with self._lock:
+                if revalidation:
+                    self.revalidations += 1
+                else:
+                    self.prefetches += 1
+            oracle_metrics.increment("revalidations" if revalidation else "prefetches")
+        except Exception:
+            # Background work must never take the scheduler down; the stale forecast keeps serving
+            logger.exception("Refreshing %s failed", base_key)
+            with self._lock:
+                self.errors += 1
+            oracle_metrics.increment("prefetch_errors")
+        finally:
+            with self._lock:
+                self._refreshing.discard(base_key)
+
+    def _notify(self, location, payload):
+        if self.on_refresh is None:
+            return
+        try:
+            self.on_refresh(location, payload)
+        except Exception:
+            # A failing listener must not cost the consultation its forecast
+            logger.exception("Refresh listener failed for %s", location)
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="oracle-prefetch", daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception("Prefetch pass failed")
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None and wait:
+            self._thread.join()
+        self._executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self._lock:
+            now = time.time()
+            return {
+                "tracked": len(self._tracked),
+                "refreshing": len(self._refreshing),
+                "prefetches_last_hour": sum(1 for t in self._prefetch_times if t > now - SECONDS_PER_HOUR),
+                "stale_served": self.stale_served,
+                "revalidations": self.revalidations,
+                "prefetches": self.prefetches,
+                "skipped_for_quota": self.skipped_for_quota,
+                "errors": self.errors,
+            }
@@ -0,0 +1,289 @@
+import codecs
+import datetime as dt
+import io
+import json
+import re
+import zlib
+
+import numpy as np
+
+# Incremental parser for tomorrow.io /v4/timelines responses.
+#
+#   parser = StreamingTimelinesParser(fields, expected_sizes={"1h": 121})
+#   for chunk in response.iter_content(65536):
+#       parser.feed(chunk)
+#   timelines = parser.close()    # {"1d": {"startTime": ..., "temperatureMax": ...}, "1h": {...}}
+#
+# Each interval object is decoded on its own as soon as its bytes arrive and written straight into
+# preallocated per-field arrays (datetime64[s] for times, float32 for values), so neither the whole
+# body nor a dict per interval is ever held. Missing values become NaN/NaT.
+
+TIME_FIELDS = ("startTime", "sunriseTime", "sunsetTime")
+
+TIMESTEP_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "1h": 3600, "1d": 86400}
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+_MARKER = re.compile(r'"timestep"\s*:\s*"(?P<timestep>[^"]*)"|"intervals"\s*:\s*\[')
+
+# Longest stretch that can hold an incomplete marker at the end of a chunk
+_MARKER_TAIL = 64
+
+
+def utc_seconds(text):
+    # tomorrow.io times are UTC with a trailing Z; anything else goes through datetime
+    if text is None:
+        return np.datetime64("NaT")
+    if text.endswith("Z"):
+        return np.datetime64(text[:-1], "s")
+    moment = dt.datetime.fromisoformat(text)
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(dt.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(moment, "s")
+
+
+class _ColumnBuilder:
+    def __init__(self, fields, capacity):
+        self.fields = [f for f in fields if f != "startTime"]
+        self.size = 0
+        self.columns = {}
+        self._allocate(max(1, capacity))
+
+    def _allocate(self, capacity):
+        old, self.columns = self.columns, {}
+        for field in ("startTime", *self.fields):
+            if field in TIME_FIELDS:
+                column = np.full(capacity, np.datetime64("NaT"), dtype="datetime64[s]")
+            else:
+                column = np.full(capacity, np.nan, dtype="float32")
+            if field in old:
+                column[:self.size] = old[field][:self.size]
+            self.columns[field] = column
+        self.capacity = capacity
+
+    def append(self, interval):
+        if self.size == self.capacity:
+            # Only when the expected size was too small; doubling keeps appends amortised O(1)
+            self._allocate(self.capacity * 2)
+
+        i = self.size
+        self.columns["startTime"][i] = utc_seconds(interval.get("startTime"))
+        values = interval.get("values") or {}
+        for field in self.fields:
+            value = values.get(field)
+            if value is None:
+                continue
+            self.columns[field][i] = utc_seconds(value) if field in TIME_FIELDS else value
+        self.size += 1
+
+    def finish(self):
+        # Trim the spare capacity; copy so the oversized buffers can be freed
+        if self.size == self.capacity:
+            return self.columns
+        return {field: column[:self.size].copy() for field, column in self.columns.items()}
+
+
+def _object_end(text, pos):
+    # Index of the "}" closing the object that pos is inside of, or None if it is not in text yet
+    depth = 0
+    in_string = escaped = False
+    for index in range(pos, len(text)):
+        char = text[index]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "{[":
+            depth += 1
+        elif char in "]}":
+            if depth == 0:
+                return index if char == "}" else None
+            depth -= 1
+    return None
+
+
+def infer_timestep(columns):
+    times = columns["startTime"]
+    if len(times) < 2:
+        return None
+    step = int(np.median(np.diff(times).astype("timedelta64[s]").astype(np.int64)))
+    for timestep, seconds in TIMESTEP_SECONDS.items():
+        if seconds == step:
+            return timestep
+    return None
+
+
+class StreamingTimelinesParser:
+    def __init__(self, fields, expected_sizes=None):
+        self.fields = list(fields)
+        self.expected_sizes = expected_sizes or {}
+        self.bytes_read = 0
+        self.timelines = {}
+
+        self._json = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._timestep = None
+        self._builder = None
+        # Columns of a timeline whose intervals ended before any "timestep" key; the rest of its
+        # object is read to see whether one follows
+        self._closed = None
+        self._unnamed = []
+
+    def feed(self, chunk):
+        self.bytes_read += len(chunk)
+        text = self._text.decode(chunk) if isinstance(chunk, bytes) else chunk
+        # Only the undecoded tail is carried over between chunks
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        self._scan()
+
+    def _scan(self):
+        buffer = self._buffer
+        while True:
+            if self._closed is not None:
+                end = _object_end(buffer, self._pos)
+                if end is None:
+                    # The timeline object continues in the next chunk
+                    return
+                # The keys after "intervals", e.g. ', "endTime": "...", "timestep": "1h"'
+                rest = json.loads("{" + buffer[self._pos:end].strip().lstrip(",") + "}")
+                if rest.get("timestep"):
+                    self.timelines[rest["timestep"]] = self._closed
+                else:
+                    # No "timestep" at all; named from the spacing in close()
+                    self._unnamed.append(self._closed)
+                self._closed = None
+                self._pos = end + 1
+                continue
+
+            if self._builder is None:
+                match = _MARKER.search(buffer, self._pos)
+                if match is None:
+                    self._pos = max(self._pos, len(buffer) - _MARKER_TAIL)
+                    return
+                self._pos = match.end()
+                if match.group("timestep") is not None:
+                    self._timestep = match.group("timestep")
+                else:
+                    self._builder = _ColumnBuilder(self.fields, self.expected_sizes.get(self._timestep, 256))
+                continue
+
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos == len(buffer):
+                self._pos = pos
+                return
+
+            if buffer[pos] == "]":
+                self._finish_timeline()
+                self._pos = pos + 1
+                continue
+
+            try:
+                interval, end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The interval continues in the next chunk
+                self._pos = pos
+                return
+            self._builder.append(interval)
+            self._pos = end
+
+    def _finish_timeline(self):
+        columns = self._builder.finish()
+        if self._timestep is not None:
+            self.timelines[self._timestep] = columns
+        else:
+            # "timestep" may still follow the intervals within this timeline's object
+            self._closed = columns
+        self._builder = None
+        self._timestep = None
+
+    def close(self):
+        self.feed(self._text.decode(b"", final=True))
+        if self._builder is not None or self._closed is not None:
+            raise ValueError("Timelines payload ended inside a timeline")
+        for index, columns in enumerate(self._unnamed):
+            self.timelines[infer_timestep(columns) or f"timeline-{index}"] = columns
+        if not self.timelines:
+            raise ValueError("Timelines payload has no intervals")
+        return self.timelines
+
+
+def parse_timelines(body, fields, expected_sizes=None, chunk_size=STREAM_CHUNK_SIZE):
+    # Whole body already in memory (cassettes, tests); still decoded one interval at a time
+    parser = StreamingTimelinesParser(fields, expected_sizes)
+    for start in range(0, len(body), chunk_size):
+        parser.feed(body[start:start + chunk_size])
+    return parser.close()
+
+
+def columns_from_payload(payload, fields):
+    # Same columns from an already decoded JSON payload, e.g. tomorrowio_stub.generate_timelines
+    timelines = {}
+    for index, timeline in enumerate(payload["data"]["timelines"]):
+        builder = _ColumnBuilder(fields, len(timeline["intervals"]))
+        for interval in timeline["intervals"]:
+            builder.append(interval)
+        columns = builder.finish()
+        timelines[timeline.get("timestep") or infer_timestep(columns) or f"timeline-{index}"] = columns
+    return timelines
+
+
+def merge_timelines(base, updates):
+    # Fold freshly fetched windows into a stored timeline. updates[0] starts at the current time, so
+    # stored rows before it are dropped; where rows share a startTime the later update wins. The
+    # stored arrays are never written to, since other sessions may still be reading them.
+    merged = {}
+    for timestep, columns in base.items():
+        parts = [update[timestep] for update in reversed(updates)
+                 if timestep in update and len(update[timestep]["startTime"])]
+        if not parts:
+            merged[timestep] = columns
+            continue
+
+        first = updates[0].get(timestep)
+        if first is not None and len(first["startTime"]):
+            keep = columns["startTime"] >= first["startTime"][0]
+            parts.append({field: column[keep] for field, column in columns.items()})
+        else:
+            parts.append(columns)
+
+        # np.unique keeps the first occurrence of each time, and parts run newest first
+        _, rows = np.unique(np.concatenate([part["startTime"] for part in parts]), return_index=True)
+        merged[timestep] = {field: np.concatenate([part[field] for part in parts])[rows] for field in columns}
+    return merged
+
+
+def timelines_version(timelines):
+    # Content hash of every column, stable across processes
+    checksum = 0
+    for timestep in sorted(timelines):
+        for field in sorted(timelines[timestep]):
+            checksum = zlib.crc32(f"{timestep}/{field}".encode("utf-8"), checksum)
+            checksum = zlib.crc32(np.ascontiguousarray(timelines[timestep][field]).view(np.uint8), checksum)
+    return checksum
+
+
+def encode_timelines(timelines):
+    # Binary .npz of every column, for ForecastCache's disk tier
+    buffer = io.BytesIO()
+    np.savez(buffer, **{f"{timestep}/{field}": column
+                        for timestep, columns in timelines.items() for field, column in columns.items()})
+    return buffer.getvalue()
+
+
+def decode_timelines(blob):
+    timelines = {}
+    with np.load(io.BytesIO(blob), allow_pickle=False) as arrays:
+        for name in arrays.files:
+            timestep, field = name.split("/", 1)
+            timelines.setdefault(timestep, {})[field] = arrays[name]
+    return timelines
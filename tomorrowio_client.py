@@ -0,0 +1,290 @@
+import datetime as dt
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import oracle_metrics
+from timeline_parser import STREAM_CHUNK_SIZE, TIMESTEP_SECONDS, StreamingTimelinesParser, columns_from_payload
+
+DEFAULT_BASE_URL = "https://api.tomorrow.io/v4"
+
+# (connect, read) seconds, so a stalled upstream can never hang a script run
+DEFAULT_CONNECT_TIMEOUT = 3.05
+DEFAULT_READ_TIMEOUT = 10
+
+# Retry policy for throttling and upstream failures
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+DEFAULT_POOL_SIZE = 20
+
+# "live" talks to the API, "record" also saves every response, "replay" only serves saved responses
+CLIENT_MODES = ("live", "record", "replay")
+
+
+class TomorrowioError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def request_window(params, now=None):
+    # Where the window starts relative to now and how long it is, in whole timesteps: the same
+    # request issued moments apart shares it, a revalidation, tail or full-horizon window does not
+    start, end = params.get("startTime"), params.get("endTime")
+    try:
+        start, end = (dt.datetime.fromisoformat(str(value).replace("Z", "+00:00")) for value in (start, end))
+    except ValueError:
+        return [start, end]
+    start, end = (value if value.tzinfo else value.replace(tzinfo=dt.timezone.utc) for value in (start, end))
+    step = min((TIMESTEP_SECONDS.get(t, 3600) for t in params.get("timesteps") or []), default=3600)
+    now = dt.datetime.now(dt.timezone.utc) if now is None else now
+    return [round((start - now).total_seconds() / step), round((end - start).total_seconds() / step)]
+
+
+def cassette_name(params):
+    # One cassette per distinct request shape and window; timestamps and the API key never affect
+    # the name, so a full-horizon request and a refresh's shorter windows are recorded apart
+    location = " ".join(str(params.get("location", "")).split()).casefold()
+    shape = json.dumps([
+        location,
+        sorted(params.get("fields") or []),
+        sorted(params.get("timesteps") or []),
+        params.get("units"),
+        request_window(params),
+    ], default=str)
+    slug = "".join(c if c.isalnum() else "-" for c in location).strip("-") or "location"
+    return f"{slug}-{hashlib.sha1(shape.encode('utf-8')).hexdigest()[:12]}.json"
+
+
+class RateLimiter:
+    # Token bucket: at most `rate` requests per second on average, with bursts of up to `burst`
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class _InFlight:
+    # One upstream request that any number of callers can wait on
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class TomorrowioClient:
+    def __init__(self, api_key, base_url=DEFAULT_BASE_URL,
+                 connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeout=DEFAULT_READ_TIMEOUT,
+                 max_retries=DEFAULT_MAX_RETRIES, backoff_base=DEFAULT_BACKOFF_BASE,
+                 backoff_max=DEFAULT_BACKOFF_MAX, pool_size=DEFAULT_POOL_SIZE,
+                 mode="live", cassette_dir=None, max_requests_per_second=None):
+        if mode not in CLIENT_MODES:
+            raise ValueError(f"mode must be one of {CLIENT_MODES}, not {mode!r}")
+        if mode != "live" and not cassette_dir:
+            raise ValueError(f"{mode} mode needs a cassette_dir")
+
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.mode = mode
+        self.cassette_dir = cassette_dir
+
+        # Every attempt, retries included, waits for a token so batch runs stay under the API quota
+        self.rate_limiter = RateLimiter(max_requests_per_second) if max_requests_per_second else None
+
+        # Keep-alive connections are reused across every session in the process
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self.requests_sent = 0
+        self.retries = 0
+        self.coalesced = 0
+
+    def get_timelines(self, params):
+        # Decoded JSON payload, as tomorrow.io sends it
+        def fetch():
+            if self.mode == "replay":
+                return self._replay(params)
+            payload = self._request_with_retry("/timelines", params)
+            if self.mode == "record":
+                self._record(params, payload)
+            return payload
+
+        return self._single_flight(self._request_key(params, "json"), fetch)
+
+    def get_timeline_columns(self, params, expected_sizes=None):
+        # Per-timestep typed columns, parsed from the body while it downloads (see timeline_parser)
+        fields = params.get("fields") or []
+
+        def read_columns(response):
+            parser = StreamingTimelinesParser(fields, expected_sizes)
+            raw = [] if self.mode == "record" else None
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+                if raw is not None:
+                    raw.append(chunk)
+            oracle_metrics.increment("payload_bytes", parser.bytes_read)
+            if raw is not None:
+                self._record(params, json.loads(b"".join(raw)))
+            return parser.close()
+
+        def fetch():
+            if self.mode == "replay":
+                return columns_from_payload(self._replay(params), fields)
+            return self._request_with_retry("/timelines", params, read_columns)
+
+        return self._single_flight(self._request_key(params, "columns"), fetch)
+
+    def _request_key(self, params, shape):
+        # Identical requests differ only by their start/end timestamps, so those are replaced by the window
+        return json.dumps(
+            [shape, {k: v for k, v in params.items() if k not in ("startTime", "endTime", "apikey")},
+             request_window(params)],
+            sort_keys=True, default=str,
+        )
+
+    def _single_flight(self, key, fetch):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = _InFlight()
+                self._inflight[key] = call
+            else:
+                call.waiters += 1
+                self.coalesced += 1
+                oracle_metrics.increment("api_coalesced")
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fetch()
+            return call.result
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            call.done.set()
+
+    def _request_with_retry(self, path, params, read_body=None):
+        url = f"{self.base_url}{path}"
+        params = dict(params, apikey=self.api_key)
+
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                self.requests_sent += 1
+                oracle_metrics.increment("api_calls")
+                response = self.session.get(url, params=params, timeout=self.timeout, stream=True)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                if last_attempt:
+                    raise TomorrowioError(f"tomorrow.io request failed: {error}") from error
+                self._sleep_before_retry(attempt)
+                continue
+
+            with response:
+                if response.status_code in RETRY_STATUSES and not last_attempt:
+                    self._sleep_before_retry(attempt, response.headers.get("Retry-After"))
+                    continue
+
+                if response.status_code != 200:
+                    raise TomorrowioError(
+                        f"tomorrow.io returned HTTP {response.status_code}", status_code=response.status_code
+                    )
+
+                try:
+                    if read_body is not None:
+                        return read_body(response)
+                    oracle_metrics.increment("payload_bytes", len(response.content))
+                    return response.json()
+                except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+                    # The connection dropped mid-body; start the download again
+                    if last_attempt:
+                        raise TomorrowioError(f"tomorrow.io response was cut off: {error}") from error
+                    self._sleep_before_retry(attempt)
+                    continue
+                except ValueError as error:
+                    raise TomorrowioError(f"tomorrow.io sent a malformed response: {error}") from error
+
+    def _record(self, params, payload):
+        os.makedirs(self.cassette_dir, exist_ok=True)
+        path = os.path.join(self.cassette_dir, cassette_name(params))
+        cassette = {
+            "recorded_at": time.time(),
+            "request": {k: v for k, v in params.items() if k != "apikey"},
+            "response": payload,
+        }
+        # Write then rename so a concurrent replay never reads half a cassette
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(cassette, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _replay(self, params):
+        path = os.path.join(self.cassette_dir, cassette_name(params))
+        try:
+            with open(path, encoding="utf-8") as f:
+                return json.load(f)["response"]
+        except FileNotFoundError:
+            raise TomorrowioError(f"No recorded response for {params.get('location')!r} in {self.cassette_dir}") from None
+
+    def _sleep_before_retry(self, attempt, retry_after=None):
+        self.retries += 1
+        oracle_metrics.increment("api_retries")
+        delay = None
+        if retry_after is not None:
+            try:
+                delay = min(float(retry_after), self.backoff_max)
+            except ValueError:
+                delay = None
+        if delay is None:
+            # Full jitter keeps many retrying sessions from hitting the API in lockstep
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        time.sleep(delay)
+
+    def stats(self):
+        return {
+            "requests_sent": self.requests_sent,
+            "retries": self.retries,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,271 @@
+import argparse
+import datetime as dt
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from tomorrowio_client import cassette_name
+
+# Local stand-in for tomorrow.io's /v4/timelines endpoint, for offline load tests and replaying
+# recorded production payloads. Run it and point the app at it with
+#   TOMORROWIO_BASE_URL=http://127.0.0.1:8765/v4 streamlit run weather_golf_oracle.py
+
+TIMESTEP_MINUTES = {"1m": 1, "5m": 5, "15m": 15, "30m": 30, "1h": 60, "1d": 24 * 60}
+
+ISO_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def parse_time(value, default):
+    if not value or value == "now":
+        return default
+    return dt.datetime.fromisoformat(value.replace("Z", "+00:00")).astimezone(dt.timezone.utc)
+
+
+def location_seed(location):
+    # Same location, same weather, so recorded and synthetic runs stay comparable
+    return int(hashlib.sha1(str(location).strip().casefold().encode("utf-8")).hexdigest()[:8], 16)
+
+
+def generate_timelines(location, start_time, end_time, timesteps=("1d", "1h"), utc_offset_hours=-7):
+    # Synthetic but plausible weather: a diurnal temperature curve, gusty wind and patchy rain
+    seed = location_seed(location)
+    rnd = random.Random(seed)
+    base_temp = rnd.uniform(35, 75)
+    temp_swing = rnd.uniform(10, 25)
+    base_wind = rnd.uniform(3, 15)
+    wet_days = {d: rnd.random() < 0.3 for d in range(400)}
+
+    local_offset = dt.timedelta(hours=utc_offset_hours)
+    first_day = (start_time + local_offset).date()
+
+    def local_hour(moment):
+        local = moment + local_offset
+        return local.hour + local.minute / 60
+
+    def day_number(moment):
+        # Absolute day, so overlapping requests for a location agree on which days are wet
+        return (moment + local_offset).date().toordinal()
+
+    def sun_times(moment):
+        local_day = (moment + local_offset).date()
+        # Day length swings +-2.5h around 12h over the year
+        day_length = 12 + 2.5 * math.sin(2 * math.pi * (local_day.timetuple().tm_yday - 80) / 365)
+        sunrise = dt.datetime.combine(local_day, dt.time(0), tzinfo=dt.timezone.utc) - local_offset \
+            + dt.timedelta(hours=12.3 - day_length / 2)
+        return sunrise, sunrise + dt.timedelta(hours=day_length)
+
+    def hourly_values(moment):
+        # Seeded by location and minute so the daily and sub-daily timelines agree
+        noise = random.Random(seed * 100003 + int(moment.timestamp()) // 60)
+        hour = local_hour(moment)
+        daylight = max(0.0, math.sin((hour - 6) / 12 * math.pi))
+        wet = wet_days[day_number(moment) % 400]
+        return {
+            "temperature": round(base_temp - temp_swing / 2 + temp_swing * daylight + noise.uniform(-2, 2), 2),
+            "windSpeed": round(max(0.0, base_wind + 6 * daylight + noise.uniform(-4, 6)), 2),
+            "precipitationProbability": int(noise.choice([40, 55, 70, 85]) if wet else noise.choice([0, 0, 0, 5, 10, 20])),
+        }
+
+    timelines = []
+    for timestep in timesteps:
+        step = dt.timedelta(minutes=TIMESTEP_MINUTES[timestep])
+        intervals = []
+
+        if timestep == "1d":
+            # Daily intervals start at 6am local like tomorrow.io's
+            day_start = dt.datetime.combine(first_day, dt.time(6), tzinfo=dt.timezone.utc) - local_offset
+            if day_start > start_time:
+                day_start -= step
+            moment = day_start
+            while moment <= end_time:
+                sunrise, sunset = sun_times(moment)
+                hours = [hourly_values(moment + dt.timedelta(hours=h)) for h in range(24)]
+                intervals.append({
+                    "startTime": moment.strftime(ISO_FORMAT),
+                    "values": {
+                        "temperature": round(sum(h["temperature"] for h in hours) / 24, 2),
+                        "temperatureMax": max(h["temperature"] for h in hours),
+                        "windSpeed": round(sum(h["windSpeed"] for h in hours) / 24, 2),
+                        "precipitationProbability": max(h["precipitationProbability"] for h in hours),
+                        "sunriseTime": sunrise.strftime(ISO_FORMAT),
+                        "sunsetTime": sunset.strftime(ISO_FORMAT),
+                    },
+                })
+                moment += step
+        else:
+            step_seconds = int(step.total_seconds())
+            moment = dt.datetime.fromtimestamp(
+                int(start_time.timestamp()) // step_seconds * step_seconds, dt.timezone.utc)
+            while moment <= end_time:
+                intervals.append({
+                    "startTime": moment.strftime(ISO_FORMAT),
+                    "values": hourly_values(moment),
+                })
+                moment += step
+
+        timelines.append({
+            "timestep": timestep,
+            "endTime": intervals[-1]["startTime"] if intervals else end_time.strftime(ISO_FORMAT),
+            "startTime": intervals[0]["startTime"] if intervals else start_time.strftime(ISO_FORMAT),
+            "intervals": intervals,
+        })
+
+    return {"data": {"timelines": timelines}}
+
+
+class StubConfig:
+    def __init__(self, latency=0.0, latency_jitter=0.0, error_rate=0.0, horizon_days=None,
+                 recordings_dir=None, utc_offset_hours=-7):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.horizon_days = horizon_days
+        self.recordings_dir = recordings_dir
+        self.utc_offset_hours = utc_offset_hours
+
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.by_location = {}
+
+
+class TimelinesHandler(BaseHTTPRequestHandler):
+    config = StubConfig()
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        config = self.config
+
+        if url.path.rstrip("/").endswith("/stats"):
+            with config.lock:
+                stats = {
+                    "requests": config.requests,
+                    "errors": config.errors,
+                    "bytes_sent": config.bytes_sent,
+                    "by_location": dict(config.by_location),
+                }
+            self._send_json(200, stats)
+            return
+
+        if not url.path.rstrip("/").endswith("/timelines"):
+            self._send_json(404, {"message": f"Unknown endpoint {url.path}"})
+            return
+
+        query = parse_qs(url.query)
+        location = query.get("location", [""])[0]
+
+        with config.lock:
+            config.requests += 1
+            config.by_location[location] = config.by_location.get(location, 0) + 1
+
+        if config.latency or config.latency_jitter:
+            time.sleep(max(0.0, config.latency + random.uniform(-config.latency_jitter, config.latency_jitter)))
+
+        if config.error_rate and random.random() < config.error_rate:
+            with config.lock:
+                config.errors += 1
+            status = random.choice([429, 500, 503])
+            self._send_json(status, {"code": status, "message": "Injected stub failure"},
+                            headers={"Retry-After": "0"} if status == 429 else None)
+            return
+
+        recorded = self._recorded_response(query)
+        if recorded is not None:
+            self._send_json(200, recorded)
+            return
+
+        now = dt.datetime.now(dt.timezone.utc)
+        start_time = parse_time(query.get("startTime", [None])[0], now)
+        end_time = parse_time(query.get("endTime", [None])[0], now + dt.timedelta(days=5))
+        if config.horizon_days is not None:
+            end_time = start_time + dt.timedelta(days=config.horizon_days)
+
+        # timesteps arrive either repeated or comma separated
+        timesteps = [t for value in query.get("timesteps", ["1d,1h"]) for t in value.split(",") if t]
+        unknown = [t for t in timesteps if t not in TIMESTEP_MINUTES]
+        if unknown:
+            self._send_json(400, {"code": 400001, "message": f"Invalid timesteps {unknown}"})
+            return
+
+        self._send_json(200, generate_timelines(location, start_time, end_time, timesteps, config.utc_offset_hours))
+
+    def _recorded_response(self, query):
+        # Recordings are cassettes written by TomorrowioClient in record mode
+        recordings_dir = self.config.recordings_dir
+        if not recordings_dir:
+            return None
+        params = {
+            "location": query.get("location", [""])[0],
+            "fields": [f for value in query.get("fields", []) for f in value.split(",") if f],
+            "timesteps": [t for value in query.get("timesteps", []) for t in value.split(",") if t],
+            "units": query.get("units", [None])[0],
+            "startTime": query.get("startTime", [None])[0],
+            "endTime": query.get("endTime", [None])[0],
+        }
+        path = os.path.join(recordings_dir, cassette_name(params))
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)["response"]
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+        with self.config.lock:
+            self.config.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        # Keep load tests quiet
+        pass
+
+
+def make_server(host="127.0.0.1", port=8765, config=None):
+    # Each server gets its own handler class so several stubs can run in one process
+    handler = type("ConfiguredTimelinesHandler", (TimelinesHandler,), {"config": config or StubConfig()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def start_in_background(host="127.0.0.1", port=0, config=None):
+    server = make_server(host, port, config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_port}/v4"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the tomorrow.io /v4/timelines endpoint")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="+- seconds of random latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 429/5xx")
+    parser.add_argument("--horizon-days", type=float, default=None, help="Override the requested forecast horizon")
+    parser.add_argument("--recordings", default=None, help="Cassette directory recorded by TomorrowioClient to serve")
+    parser.add_argument("--utc-offset", type=float, default=-7, help="UTC offset used for synthetic days")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.latency_jitter, args.error_rate, args.horizon_days,
+                        args.recordings, args.utc_offset)
+    server = make_server(args.host, args.port, config)
+    print(f"Serving stub tomorrow.io at http://{args.host}:{server.server_port}/v4/timelines")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import argparse
+import datetime as dt
+import json
+import os
+import sqlite3
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+import oracle_core
+import oracle_metrics
+from forecast_cache import DEFAULT_CACHE_PATH, ForecastCache
+from gazetteer import resolve_location
+from oracle_batch import read_records
+from timeline_parser import decode_timelines, encode_timelines
+from tomorrowio_client import DEFAULT_BASE_URL, TomorrowioClient, TomorrowioError
+
+# Saved threshold watchlists and change-only alerts.
+#
+#   python watchlists.py add --member ana --location "Denver, CO" --min-temp 55 --max-wind 12 --max-rain 20
+#   python watchlists.py import members.csv         # member, location, min_temp, max_wind, max_rain[, min_hours]
+#   python watchlists.py evaluate --alerts alerts.jsonl
+#
+# Watches are indexed by resolved location, so one refreshed forecast is checked against every watch
+# of that course at once (WatchlistEvaluator.evaluate). Each distinct threshold is placed once in a
+# sorted list per metric and each forecast hour is ranked against those lists once; a watch passes
+# an hour when its position beats the hour's rank on all three, a comparison of small integers.
+# An alert is emitted only for a golf-able window that overlaps none of the windows the same watch
+# had on its previous evaluation. In the app the prefetch scheduler evaluates every forecast it fetches.
+
+DEFAULT_WATCHLIST_PATH = os.path.join(".oracle_cache", "watchlists.sqlite3")
+DEFAULT_ALERTS_PATH = os.path.join(".oracle_cache", "alerts.jsonl")
+
+# Shortest window worth an alert unless the watch says otherwise
+DEFAULT_MIN_HOURS = 2.0
+
+
+class WatchlistStore:
+    def __init__(self, path=DEFAULT_WATCHLIST_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS watches (
+                id INTEGER PRIMARY KEY,
+                member TEXT NOT NULL,
+                location TEXT NOT NULL,
+                query TEXT NOT NULL,
+                min_temp REAL NOT NULL,
+                max_wind REAL NOT NULL,
+                max_rain REAL NOT NULL,
+                min_hours REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS watches_query ON watches (query);
+            CREATE TABLE IF NOT EXISTS watch_windows (
+                watch_id INTEGER NOT NULL,
+                start REAL NOT NULL,
+                end REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS watch_windows_watch ON watch_windows (watch_id);
+            """
+        )
+
+    def add(self, member, location, min_temp, max_wind, max_rain, min_hours=DEFAULT_MIN_HOURS):
+        query = resolve_location(location)["query"]
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO watches (member, location, query, min_temp, max_wind, max_rain, min_hours) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (member, location, query, float(min_temp), float(max_wind), float(max_rain), float(min_hours)),
+            )
+            self._db.commit()
+            return cursor.lastrowid
+
+    def remove(self, watch_id):
+        with self._lock:
+            self._db.execute("DELETE FROM watches WHERE id = ?", (watch_id,))
+            self._db.execute("DELETE FROM watch_windows WHERE watch_id = ?", (watch_id,))
+            self._db.commit()
+
+    def watches(self, query=None):
+        # Every watch, or those of one resolved location, as a frame
+        sql = "SELECT id, member, location, query, min_temp, max_wind, max_rain, min_hours FROM watches"
+        with self._lock:
+            if query is None:
+                return pd.read_sql_query(sql + " ORDER BY id", self._db)
+            return pd.read_sql_query(sql + " WHERE query = ? ORDER BY id", self._db, params=(query,))
+
+    def locations(self):
+        # One location as typed per watched place, for fetching
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT MIN(location) FROM watches GROUP BY query")]
+
+    def previous_windows(self, watch_ids):
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT watch_id, start, end FROM watch_windows WHERE watch_id IN ({','.join('?' * len(watch_ids))})",
+                [int(i) for i in watch_ids],
+            ).fetchall()
+        previous = {}
+        for watch_id, start, end in rows:
+            previous.setdefault(watch_id, []).append((start, end))
+        return previous
+
+    def replace_windows(self, watch_ids, windows):
+        # windows: (watch_id, start, end) in epoch seconds
+        with self._lock:
+            self._db.execute(
+                f"DELETE FROM watch_windows WHERE watch_id IN ({','.join('?' * len(watch_ids))})",
+                [int(i) for i in watch_ids],
+            )
+            self._db.executemany("INSERT INTO watch_windows (watch_id, start, end) VALUES (?, ?, ?)", windows)
+            self._db.commit()
+
+
+def profile_windows(forecast_df, min_temp, max_wind, max_rain, max_gap=pd.Timedelta(hours=1)):
+    # Golf-able windows of many threshold profiles over one forecast, without a pass per profile.
+    # Returns (profile, start row, end row) arrays; windows follow golfable_windows' rules.
+    thresholds = np.column_stack([min_temp, max_wind, max_rain]).astype(np.float64)
+    if len(thresholds) == 0 or len(forecast_df) == 0:
+        empty = np.array([], dtype=int)
+        return empty, empty, empty
+
+    # Identical thresholds are evaluated once
+    unique, inverse = np.unique(thresholds, axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+
+    def ranks(values, limits, passes_below):
+        # Position of each profile in the sorted limits, and per hour how many positions pass
+        order = np.argsort(limits, kind="stable")
+        position = np.empty(len(limits), dtype=np.int64)
+        position[order] = np.arange(len(limits))
+        sorted_limits = limits[order]
+        if passes_below:
+            # min_temp <= value: the first `rank` positions pass
+            rank = np.searchsorted(sorted_limits, values, side="right")
+            rank[np.isnan(values)] = 0
+        else:
+            # value <= max: positions from `rank` on pass
+            rank = np.searchsorted(sorted_limits, values, side="left")
+            rank[np.isnan(values)] = len(limits)
+        return position, rank
+
+    temp_position, temp_rank = ranks(forecast_df["temperature"].to_numpy(dtype=np.float64), unique[:, 0], True)
+    wind_position, wind_rank = ranks(forecast_df["wind_speed"].to_numpy(dtype=np.float64), unique[:, 1], False)
+    rain_position, rain_rank = ranks(forecast_df["precip_prob"].to_numpy(dtype=np.float64), unique[:, 2], False)
+
+    # distinct thresholds x hours
+    golfable = (
+        (temp_position[:, None] < temp_rank[None, :]) &
+        (wind_position[:, None] >= wind_rank[None, :]) &
+        (rain_position[:, None] >= rain_rank[None, :])
+    )
+
+    # Same run-length rule as golfable_windows, for every row at once
+    times = forecast_df["datetime"].to_numpy(dtype="datetime64[ns]")
+    days = forecast_df["date"].to_numpy(dtype="datetime64[ns]")
+    linked = (days[1:] == days[:-1]) & (np.diff(times) <= max_gap.to_timedelta64())
+    continues = np.zeros_like(golfable)
+    continues[:, 1:] = golfable[:, 1:] & golfable[:, :-1] & linked[None, :]
+    ends = np.zeros_like(golfable)
+    ends[:, :-1] = ~continues[:, 1:]
+    ends[:, -1] = True
+
+    # Row-major nonzero keeps starts and ends of each profile in the same order
+    window_unique, start_rows = np.nonzero(golfable & ~continues)
+    _, end_rows = np.nonzero(golfable & ends)
+
+    # Fan the distinct thresholds' windows out to every profile that shares them
+    order = np.argsort(inverse, kind="stable")
+    profiles_sorted = inverse[order]
+    first = np.searchsorted(profiles_sorted, window_unique, side="left")
+    last = np.searchsorted(profiles_sorted, window_unique, side="right")
+    counts = last - first
+    repeat = np.repeat(np.arange(len(window_unique)), counts)
+    offsets = np.arange(len(repeat)) - np.repeat(np.cumsum(counts) - counts, counts)
+    profiles = order[np.repeat(first, counts) + offsets]
+    return profiles, start_rows[repeat], end_rows[repeat]
+
+
+class JsonlAlertSink:
+    # Appends one JSON object per alert to a local file
+    def __init__(self, path=DEFAULT_ALERTS_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, alerts):
+        if not alerts:
+            return
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            for alert in alerts:
+                f.write(json.dumps(alert) + "\n")
+
+
+class QueueAlertSink:
+    # Puts each alert on a queue.Queue for an in-process consumer
+    def __init__(self, queue):
+        self.queue = queue
+
+    def emit(self, alerts):
+        for alert in alerts:
+            self.queue.put(alert)
+
+
+class WatchlistEvaluator:
+    def __init__(self, store, sink):
+        self.store = store
+        self.sink = sink
+
+        # Resolved location -> lock held from reading a location's previous windows to replacing them,
+        # so overlapping evaluations of one course never both report the same new window
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def _location_lock(self, query):
+        with self._locks_lock:
+            return self._locks.setdefault(query, threading.Lock())
+
+    def evaluate(self, location, timelines, store=None):
+        # Check one freshly fetched forecast against every watch of its location; returns the alerts
+        place = resolve_location(location)
+        watches = self.store.watches(place["query"])
+        if watches.empty:
+            return []
+
+        with oracle_metrics.span("watchlist_evaluate"):
+            forecast = oracle_core.parse_forecast(location, timelines, place["timezone"], store)
+            forecast_df = forecast["filtered_forecast"]
+            profiles, start_rows, end_rows = profile_windows(
+                forecast_df, watches["min_temp"].to_numpy(), watches["max_wind"].to_numpy(),
+                watches["max_rain"].to_numpy())
+
+            seconds = forecast_df["datetime"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+            starts, ends = seconds[start_rows], seconds[end_rows]
+            long_enough = (ends - starts) / 3600 >= watches["min_hours"].to_numpy()[profiles]
+            profiles, starts, ends = profiles[long_enough], starts[long_enough], ends[long_enough]
+
+            watch_ids = watches["id"].to_numpy()
+            created = dt.datetime.now(dt.timezone.utc).isoformat()
+            tz = forecast_df["datetime"].dt.tz
+
+            with self._location_lock(place["query"]):
+                previous = self.store.previous_windows(watch_ids)
+                alerts = self._new_window_alerts(watches, profiles, starts, ends, previous, tz, created)
+                self.store.replace_windows(watch_ids, [(int(watch_ids[p]), float(s), float(e))
+                                                       for p, s, e in zip(profiles, starts, ends)])
+
+        self.sink.emit(alerts)
+        oracle_metrics.increment("watch_alerts", len(alerts))
+        return alerts
+
+    def _new_window_alerts(self, watches, profiles, starts, ends, previous, tz, created):
+        alerts = []
+        for profile, start, end in zip(profiles, starts, ends):
+            watch = watches.iloc[profile]
+            # Only windows that overlap nothing the watch already knew about are news
+            seen = previous.get(watch["id"], [])
+            if any(start <= seen_end and seen_start <= end for seen_start, seen_end in seen):
+                continue
+            start_time = pd.Timestamp(start, unit="s", tz="UTC").tz_convert(tz)
+            alerts.append({
+                "watch_id": int(watch["id"]),
+                "member": watch["member"],
+                "location": watch["location"],
+                "date": start_time.date().isoformat(),
+                "start_time": start_time.isoformat(),
+                "end_time": pd.Timestamp(end, unit="s", tz="UTC").tz_convert(tz).isoformat(),
+                "hours": round(float(end - start) / 3600, 2),
+                "min_temp": float(watch["min_temp"]),
+                "max_wind": float(watch["max_wind"]),
+                "max_rain": float(watch["max_rain"]),
+                "created": created,
+            })
+        return alerts
+
+
+def evaluate_all(evaluator, cache, client, resolution=oracle_core.DEFAULT_RESOLUTION,
+                 horizon_days=oracle_core.DEFAULT_HORIZON_DAYS, max_workers=oracle_core.MAX_CONCURRENT_FETCHES):
+    # Fetch every watched location (cache first) and evaluate it; returns (alerts, failed locations)
+    locations = evaluator.store.locations()
+    alerts, failed = [], []
+    if not locations:
+        return alerts, failed
+
+    def run(location):
+        place = resolve_location(location)
+        data = oracle_core.fetch_forecast(cache, client, place["query"], resolution, horizon_days)
+        return evaluator.evaluate(place["query"], data)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(locations)))) as executor:
+        futures = {executor.submit(run, location): location for location in locations}
+        for future in as_completed(futures):
+            try:
+                alerts.extend(future.result())
+            except (TomorrowioError, KeyError, IndexError):
+                failed.append(futures[future])
+    return alerts, failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Saved threshold watchlists and golf-able window alerts")
+    parser.add_argument("--db", default=DEFAULT_WATCHLIST_PATH, help="Watchlist database")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Watch a course with a member's thresholds")
+    add.add_argument("--member", required=True)
+    add.add_argument("--location", required=True)
+    add.add_argument("--min-temp", type=float, required=True)
+    add.add_argument("--max-wind", type=float, required=True)
+    add.add_argument("--max-rain", type=float, required=True)
+    add.add_argument("--min-hours", type=float, default=DEFAULT_MIN_HOURS)
+
+    bulk = commands.add_parser("import", help="Add watches from a CSV or JSONL file")
+    bulk.add_argument("path")
+
+    commands.add_parser("list", help="Print every watch")
+
+    remove = commands.add_parser("remove", help="Delete a watch")
+    remove.add_argument("watch_id", type=int)
+
+    evaluate = commands.add_parser("evaluate", help="Check every watched course and emit new-window alerts")
+    evaluate.add_argument("--alerts", default=DEFAULT_ALERTS_PATH, help="JSONL file alerts are appended to")
+    evaluate.add_argument("--cache", default=DEFAULT_CACHE_PATH, help="Shared forecast cache, '' to disable")
+    evaluate.add_argument("--resolution", default=oracle_core.DEFAULT_RESOLUTION)
+    evaluate.add_argument("--horizon-days", type=int, default=oracle_core.DEFAULT_HORIZON_DAYS)
+    evaluate.add_argument("--base-url", default=os.environ.get("TOMORROWIO_BASE_URL", DEFAULT_BASE_URL))
+    evaluate.add_argument("--mode", default=os.environ.get("TOMORROWIO_MODE", "live"), help="live, record or replay")
+    evaluate.add_argument("--cassette-dir", default=os.environ.get(
+        "TOMORROWIO_CASSETTE_DIR", os.path.join(".oracle_cache", "cassettes")))
+    args = parser.parse_args()
+
+    store = WatchlistStore(args.db)
+
+    if args.command == "add":
+        print(store.add(args.member, args.location, args.min_temp, args.max_wind, args.max_rain, args.min_hours))
+    elif args.command == "import":
+        count = 0
+        for record in read_records(args.path):
+            store.add(record["member"], record["location"], record["min_temp"], record["max_wind"],
+                      record["max_rain"], record.get("min_hours") or DEFAULT_MIN_HOURS)
+            count += 1
+        print(f"{count} watches added", file=sys.stderr)
+    elif args.command == "list":
+        print(store.watches().to_string(index=False))
+    elif args.command == "remove":
+        store.remove(args.watch_id)
+    else:
+        client = TomorrowioClient(os.environ.get("TOMORROWIO_API_KEY"), base_url=args.base_url, mode=args.mode,
+                                  cassette_dir=args.cassette_dir)
+        cache = ForecastCache(path=args.cache or None, encode=encode_timelines, decode=decode_timelines)
+        alerts, failed = evaluate_all(WatchlistEvaluator(store, JsonlAlertSink(args.alerts)), cache, client,
+                                      args.resolution, args.horizon_days)
+        for location in failed:
+            print(f"FAILED {location}", file=sys.stderr)
+        print(f"{len(alerts)} new alerts written to {args.alerts}", file=sys.stderr)
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,444 +1,193 @@
 import datetime as dt  
+import os
+import uuid
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-import requests
-import pytz
-from pytz import timezone 
-from datetime import datetime, timedelta
-
-# API tomorrowio key with streamlit secrets feature
-api_key = st.secrets["Tomorrowio_API_KEY"]
+import oracle_metrics
+from forecast_archive import DEFAULT_ARCHIVE_PATH, ForecastArchive
+from forecast_cache import ForecastCache
+from forecast_store import ForecastStore
+from gazetteer import resolve_location
+from oracle_core import (DEFAULT_HORIZON_DAYS, DEFAULT_RESOLUTION, TEE_TIME_HOURS, build_day_views, day_figure,
+                         fetch_forecast, local_today, parse_forecast, rank_courses, rank_tee_times,
+                         tee_time_rows)
+from prefetch_scheduler import DEFAULT_MAX_PREFETCHES_PER_HOUR, DEFAULT_TOP_N, PrefetchScheduler
+from timeline_parser import decode_timelines, encode_timelines
+from tomorrowio_client import DEFAULT_BASE_URL, TomorrowioClient, TomorrowioError
+from watchlists import (DEFAULT_ALERTS_PATH, DEFAULT_WATCHLIST_PATH, JsonlAlertSink, WatchlistEvaluator,
+                        WatchlistStore)
+
+# Thin Streamlit layer over oracle_core: widgets, session state and rendering only
+
+def get_setting(name, default=None):
+    # Environment variables win so load tests and replay runs need no secrets file
+    value = os.environ.get(name.upper())
+    if value:
+        return value
+    # Only consult st.secrets when a secrets file exists, otherwise Streamlit renders an error
+    if not st.secrets.load_if_toml_exists():
+        return default
+    return st.secrets.get(name, default)
+
+# One forecast cache per Streamlit process, shared by every session and rerun
+@st.cache_resource
+def get_forecast_cache():
+    # Forecasts are stored as typed columns, not JSON
+    return ForecastCache(encode=encode_timelines, decode=decode_timelines)
+
+# Keeps the most requested courses fresh in the background and serves expired forecasts while they refresh
+@st.cache_resource
+def get_prefetch_scheduler():
+    # Every fresh forecast is checked against the saved watchlists of its course. The store and
+    # evaluator are captured here, since refreshes run on background threads.
+    store, evaluator = get_forecast_store(), get_watchlist_evaluator()
+    on_refresh = None if evaluator is None else (
+        lambda location, payload: evaluator.evaluate(location, payload, store))
+    return PrefetchScheduler(
+        get_forecast_cache(),
+        top_n=int(get_setting("Oracle_PREFETCH_TOP_N", DEFAULT_TOP_N)),
+        max_prefetches_per_hour=int(get_setting("Oracle_PREFETCH_BUDGET", DEFAULT_MAX_PREFETCHES_PER_HOUR)),
+        on_refresh=on_refresh,
+    ).start()
+
+# Parsed forecasts shared read-only by every session; memory grows with locations, not sessions
+@st.cache_resource
+def get_forecast_store():
+    return ForecastStore()
+
+# Every fetched forecast is appended here for history and drift analysis; ORACLE_ARCHIVE_DIR=off disables it
+@st.cache_resource
+def get_forecast_archive():
+    archive_dir = get_setting("Oracle_ARCHIVE_DIR", DEFAULT_ARCHIVE_PATH)
+    if archive_dir.lower() == "off":
+        return None
+    return ForecastArchive(archive_dir)
 
-# Define the MST timezone
-mst = timezone('US/Mountain')
+# Members' saved thresholds; new golf-able windows are appended to ORACLE_ALERTS. ORACLE_WATCHLISTS=off disables it
+@st.cache_resource
+def get_watchlist_evaluator():
+    watchlist_path = get_setting("Oracle_WATCHLISTS", DEFAULT_WATCHLIST_PATH)
+    if watchlist_path.lower() == "off":
+        return None
+    return WatchlistEvaluator(WatchlistStore(watchlist_path),
+                              JsonlAlertSink(get_setting("Oracle_ALERTS", DEFAULT_ALERTS_PATH)))
+
+# Sub-daily resolution (1m, 5m, 15m, 30m or 1h) and days ahead to request
+def get_forecast_settings():
+    return (get_setting("Oracle_RESOLUTION", DEFAULT_RESOLUTION),
+            int(get_setting("Oracle_HORIZON_DAYS", DEFAULT_HORIZON_DAYS)))
+
+# One pooled tomorrow.io client per Streamlit process, so sessions share connections and in-flight requests
+@st.cache_resource
+def get_tomorrowio_client():
+    # API tomorrowio key with streamlit secrets feature, read on first use rather than at import.
+    # TOMORROWIO_BASE_URL points the app at tomorrowio_stub.py; TOMORROWIO_MODE=record|replay
+    # saves or serves responses from TOMORROWIO_CASSETTE_DIR.
+    return TomorrowioClient(
+        get_setting("Tomorrowio_API_KEY"),
+        base_url=get_setting("Tomorrowio_BASE_URL", DEFAULT_BASE_URL),
+        mode=get_setting("Tomorrowio_MODE", "live"),
+        cassette_dir=get_setting("Tomorrowio_CASSETTE_DIR", os.path.join(".oracle_cache", "cassettes")),
+    )
 
 # Function to get weather data
 def get_weather_forecast(city = 'Denver'):
-    url = f"https://api.tomorrow.io/v4/timelines"
-    params = {
-        "location": f"{city}",
-        "fields": ["temperature", "temperatureMax", "precipitationProbability", "windSpeed", 
-                    "sunriseTime", "sunsetTime"],
-        "units": "imperial",
-        "timesteps": ["1d", "1h"],
-        "apikey": api_key,
-        "startTime": dt.datetime.now(dt.timezone.utc).isoformat(),
-        "endTime": (dt.datetime.now(dt.timezone.utc) + dt.timedelta(days=5)).isoformat(),
-    }
-
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json()
-    else:
+    try:
+        return fetch_forecast(get_prefetch_scheduler(), get_tomorrowio_client(), city, *get_forecast_settings(),
+                              archive=get_forecast_archive())
+    except TomorrowioError:
         st.error("Failed to fetch weather data")
         return None
-    
-def filter_forecast_by_sunrise_sunset(hourly_forecast, sunrise_time, sunset_time):
-    # Convert to datetime objects for today's sunrise and sunset
-    
-    sunrise_dt_utc = dt.datetime.fromisoformat(sunrise_time[:-1])
-    sunset_dt_utc = dt.datetime.fromisoformat(sunset_time[:-1])
-    
-    # Define the UTC and MST time zones
-    utc = pytz.utc
-    mst = pytz.timezone('US/Mountain')
-
-    # Localize the datetime objects to UTC
-    sunrise_dt_utc = utc.localize(sunrise_dt_utc)
-    sunset_dt_utc = utc.localize(sunset_dt_utc)
-    
-
-    # Extract only the time part for sunrise and sunset in MST
-    sunrise_time_only = sunrise_dt_utc.astimezone(mst).time()
-    sunset_time_only = sunset_dt_utc.astimezone(mst).time()
-
-    # Filter the forecast data
-    filtered_forecast = []
-
-    for hour in hourly_forecast:
-        # Convert 'startTime' to a UTC datetime object first
-        forecast_time_utc = dt.datetime.fromisoformat(hour["startTime"][:-1])
-        forecast_time_utc = utc.localize(forecast_time_utc)
-
-        # Convert the UTC datetime object to MST
-        forecast_time_mst = forecast_time_utc.astimezone(mst)
-        
-        # Extract the date part of the forecast time
-        forecast_date = forecast_time_mst.date()
-        
-        # Create new datetime objects for sunrise and sunset on the forecast date
-        sunrise_dt_mst = dt.datetime.combine(forecast_date, sunrise_time_only, tzinfo=mst)
-        sunset_dt_mst = dt.datetime.combine(forecast_date, sunset_time_only, tzinfo=mst)
-
-        # Check if the forecast time is between sunrise and sunset on the same day
-        if sunrise_dt_mst <= forecast_time_mst <= sunset_dt_mst:
-            
-            filtered_forecast.append({
-                "datetime": forecast_time_mst,
-                "date": forecast_time_mst.date().strftime('%Y-%m-%d'),
-                "time": forecast_time_mst.strftime('%I:%M %p'),
-                "temperature": hour["values"]["temperature"],
-                "wind_speed": hour["values"]["windSpeed"],
-                "precip_prob": hour["values"]["precipitationProbability"]
-            })
-
-    return filtered_forecast, sunset_time_only
-    
-def graph_forecast_w_highlight(filtered_forecast, sunset_dt_mst, select_date, date,
-                               min_temp, max_wind, max_rain, 
-                               temp_diff=0, wind_diff=0, rain_diff=0):
 
-    today = dt.date.today()
+def graph_forecast_w_highlight(day_view, week_strip):
+    select_date = day_view["date"]
 
-    if select_date == today:
-    
-        # Define the timezone (e.g., US/Mountain)
-        mst = timezone("US/Mountain")
-
-        # Get the current time in MST (timezone-aware)
-        now_utc = datetime.now(pytz.utc)
-
-        # Format the current time to match the desired ISO 8601 format
-        now_utc_str = now_utc.strftime("%Y-%m-%dT%H:%M:%SZ")
-
-        # Check if the current time is later than the sunset time
-        if now_utc_str > sunset_dt_mst:
-            st.subheader("The current time is past sunset") 
-            st.subheader("")
-            st.subheader("The :rainbow[Golf-able Oracle] is already dreaming about tomorrow's golf-abilities 😴")
-            st.subheader("")
-            golfable_hrs_each_day(filtered_forecast, min_temp, max_wind, max_rain, select_date)
-            return
-    
-    filtered_forecast_copy = filtered_forecast[0]
+    # Check if the current time is later than today's sunset
+    today = local_today(day_view["sunset"].tz)
 
-    # Convert to DataFrame
-    df = pd.DataFrame(filtered_forecast_copy)
-    
-    # Step 2: Ensure 'datetime' is properly parsed and create combined 'datetime' column
-    #df['datetime'] = pd.to_datetime(df['datetime'], errors='coerce')
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df['time'] = pd.to_datetime(df['time'], format='%I:%M %p', errors='coerce').dt.strftime('%I:%M %p')
-    
-    # Step 3: Add a combined datetime column (date + time)
-    df['datetime_combined'] = df['date'].astype(str) + ' ' + df['time']
-    df['datetime_combined'] = pd.to_datetime(df['datetime_combined'], errors='coerce')
-    
-    # Step 4: Melt the DataFrame to long format
-    df_melted = df.melt(id_vars=['datetime_combined', 'date', 'time'], 
-                        value_vars=['temperature', 'wind_speed', 'precip_prob'], 
-                        var_name='Metric', value_name='Value')
-
-    
-
-    # Step 5: Pivot the data so each metric becomes a column
-    pivot_df = df_melted.pivot(index='datetime_combined', columns='Metric', values='Value').reset_index()
-
-    # Step 6: Sort data by combined datetime
-    pivot_df = pivot_df.sort_values(by='datetime_combined')
-
-    # Step 7: Extract 'time' for display (AM/PM format)
-    pivot_df['time_display'] = pivot_df['datetime_combined'].dt.strftime('%I:%M %p')
-    
-    # Step 8: Filter by a specific date (e.g., '2024-11-19') before plotting
-    selected_date = str(select_date)
-    
-    daily_df = pivot_df[pivot_df['datetime_combined'].dt.date.astype(str) == selected_date]
-
-    # Step 5: Filter data where all conditions are met
-    highlight_df = daily_df[
-        (daily_df['temperature'] >= min_temp) & 
-        (daily_df['wind_speed'] <= max_wind) & 
-        (daily_df['precip_prob'] <= max_rain)
-    ]
-
-    # Step 6: Initialize variables to track start and end times
-    highlight_ranges = []
-    start_time = None
-
-    # Step 7: Loop through each row to find continuous intervals
-    for i in range(len(highlight_df)):
-        current_time = highlight_df.iloc[i]['datetime_combined']
-
-        if start_time is None:
-            start_time = current_time
-
-        # Check for next row and 1-hour gap
-        if i + 1 < len(highlight_df):
-            next_time = highlight_df.iloc[i + 1]['datetime_combined']
-            hour_diff = (next_time - current_time).total_seconds() / 3600
-
-            if hour_diff > 1 or current_time.date() != next_time.date():
-                highlight_ranges.append((start_time, current_time))
-                start_time = None
-        else:
-            highlight_ranges.append((start_time, current_time))
-
-    # Convert highlight_ranges to a DataFrame if not empty
-    if highlight_ranges:
-        highlight_ranges_df = pd.DataFrame(highlight_ranges, columns=['start_time', 'end_time'])
-        highlight_ranges_df['start_date'] = highlight_ranges_df['start_time'].dt.date
-        highlight_ranges_df['start_hour'] = highlight_ranges_df['start_time'].dt.strftime('%I:%M %p')
-        highlight_ranges_df['end_hour'] = highlight_ranges_df['end_time'].dt.strftime('%I:%M %p')
-    else:
-        highlight_ranges_df = pd.DataFrame(columns=['start_time', 'end_time', 'start_date', 'start_hour', 'end_hour'])
-
-    # Step 8: Plot with Plotly Express
-    fig = px.line(
-        daily_df.melt(
-            id_vars=['time_display'], 
-            value_vars=['precip_prob', 'temperature', 'wind_speed'], 
-            var_name='Metric', 
-            value_name='Value'),
-        x='time_display',
-        y='Value',
-        color='Metric',
-        labels={
-            'Value': 'Measurement',
-            'Metric': 'Metric',
-            'time_display': 'Time (MST)'
-        },
-        title='Weather Metrics Over Time',
-        markers=True
-    )
-
-    # Step 9: Add shaded areas for each continuous time range, only if highlight_ranges_df is not empty
-    if not highlight_ranges_df.empty:
-        for _, row in highlight_ranges_df.iterrows():
-            fig.add_shape(
-                type='rect',
-                x0=row['start_hour'],
-                x1=row['end_hour'],
-                y0=0,
-                y1=1,
-                xref='x',
-                yref='paper',
-                fillcolor='rgba(144, 238, 144, 0.3)',  # Light green with transparency
-                line=dict(width=1),
-            )
-
-    # Step 10: Customize the layout
-    fig.update_layout(
-        xaxis_title='Time (MST)',
-        yaxis_title='Value (°F, mph, %)',
-        legend_title='Metrics',
-        template='plotly_dark',
-        hovermode='x unified',
-    )
+    if select_date == today and pd.Timestamp.now(tz="UTC") > day_view["sunset"]:
+        st.subheader("The current time is past sunset") 
+        st.subheader("")
+        st.subheader("The :rainbow[Golf-able Oracle] is already dreaming about tomorrow's golf-abilities 😴")
+        st.subheader("")
+        week_day_metrics(week_strip, today)
+        return
 
     # Display the chart in Streamlit
-    st.plotly_chart(fig)
+    with oracle_metrics.span("plotly_chart"):
+        st.plotly_chart(day_figure(day_view))
 
     # Oracle Prophecy
-    if temp_diff < 0 or wind_diff > 0 or rain_diff > 0:
+    if day_view["temp_diff"] < 0 or day_view["wind_diff"] > 0 or day_view["rain_diff"] > 0:
         st.subheader(":red[The] :rainbow[Golf-able Oracle] :red[Has Prophesied Sub-Bar Golf Ranges FORE! This Day]")
         st.subheader("")
         st.subheader("")
 
-        golfable_hrs_each_day(filtered_forecast, min_temp, max_wind, max_rain, select_date)
-        
-
     else:
-        # Convert the timedelta to total hours as a float
-        total_hours = highlight_ranges_df['end_time'] - highlight_ranges_df['start_time']
-        total_hours_in_float = total_hours.dt.total_seconds() / 3600  # Converts timedelta to hours
-
-        # Round the values to whole numbers
-        total_hours_rounded = total_hours_in_float.round()
-
-        # Convert to a string representation
-        total_hours_string = total_hours_rounded.astype(int).astype(str).to_string(index=False)
-
-        st.subheader(f":green[The] :rainbow[Golf-able Oracle] :green[Has Prophesied] :blue[{total_hours_string}Hr] :green[of Golf-ability]")
+        st.subheader(f":green[The] :rainbow[Golf-able Oracle] :green[Has Prophesied] :blue[{day_view['total_hours_string']}Hr] :green[of Golf-ability]")
         st.subheader("")
         st.subheader("")
 
-        golfable_hrs_each_day(filtered_forecast, min_temp, max_wind, max_rain, select_date)
-
-
-def golfable_hrs_each_day(filtered_forecast, min_temp, max_wind, max_rain, select_date):
-    filtered_forecast_day_copy = filtered_forecast[0]
-
-    # Convert to DataFrame
-    df = pd.DataFrame(filtered_forecast_day_copy)
-    
-    # Ensure 'datetime' is properly parsed and create combined 'datetime' column
-    df['date'] = pd.to_datetime(df['date'], errors='coerce')
-    df['time'] = pd.to_datetime(df['time'], format='%I:%M %p', errors='coerce').dt.strftime('%I:%M %p')
-    df['datetime_combined'] = pd.to_datetime(df['date'].astype(str) + ' ' + df['time'], errors='coerce')
-
-    # Filter rows meeting the weather criteria
-    qualifying_df = df[
-        (df['temperature'] >= min_temp) &
-        (df['wind_speed'] <= max_wind) &
-        (df['precip_prob'] <= max_rain)
-    ]
-
-    # Group by date for consecutive hour calculations
-    qualifying_df['day'] = qualifying_df['datetime_combined'].dt.date
-    grouped = qualifying_df.groupby('day')
-
-    # Initialize dictionary to store total hours per day
-    daily_hours = {day: 0 for day in df['date'].dt.date.unique()}  # Start with 0 for all days
-
-    for day, group in grouped:
-        group = group.sort_values(by='datetime_combined')
-        total_consecutive_hours = 0
-        current_start_time = None
-
-        for i in range(len(group)):
-            current_time = group.iloc[i]['datetime_combined']
-
-            if current_start_time is None:
-                current_start_time = current_time
-
-            if i + 1 < len(group):
-                next_time = group.iloc[i + 1]['datetime_combined']
-                hour_diff = (next_time - current_time).total_seconds() / 3600
-
-                if hour_diff > 1:
-                    total_consecutive_hours += (current_time - current_start_time).total_seconds() / 3600
-                    current_start_time = None
-            else:
-                total_consecutive_hours += (current_time - current_start_time).total_seconds() / 3600
+    week_day_metrics(week_strip, today)
 
-        daily_hours[day] = round(total_consecutive_hours)
 
-    # Convert total consecutive hours to a list
-    total_consecutive_hours_list = list(daily_hours.values())
+# Days per row of the metrics strip; longer horizons wrap onto further rows
+STRIP_DAYS_PER_ROW = 7
 
-    week_day_metrics(select_date, total_consecutive_hours_list)
-
-
-def week_day_metrics(select_date, total_consecutive_hours_list):
-
-    # Get today's date
-    today = dt.date.today()
-    # Convert today to string
-    today_to_string = str(today)
-    # Convert the string to a datetime object
-    today_date_obj = datetime.strptime(today_to_string, '%Y-%m-%d')
-
-    # Convert select_date to string
-    date_to_str = str(select_date)
-
-    # Get the day of the week
-    day_of_week_str = today_date_obj.strftime('%A')
-
-    # Create a list of the next 5 days
-    six_days_date_list = [(today_date_obj + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(0, 6)]
-    
-    # Create a list of the corresponding weekday labels
-    six_days_name_list = [(today_date_obj + timedelta(days=i)).strftime('%A') for i in range(0, 6)]
+def week_day_metrics(week_strip, today=None):
+    # A metric and a day button for every forecast day from today on, seven to a row,
+    # straight from the prebuilt daily summary
+    today = today or dt.date.today()
+    days = [day for day in week_strip if day["date"] >= today]
+    if not days:
+        return
 
-    col1, col2, col3, col4, col5 = st.columns([1, 1, 1, 1, 1], gap='large')
+    for start in range(0, len(days), STRIP_DAYS_PER_ROW):
+        columns = st.columns(min(len(days), STRIP_DAYS_PER_ROW), gap='large')
+        for column, day in zip(columns, days[start:start + STRIP_DAYS_PER_ROW]):
+            hours = day["golfable_hours"]
+            with column:
+                st.metric(
+                    label=str(day["date"]),
+                    value=day["weekday"][:3],
+                    delta=hours,
+                    delta_color="off" if hours == 0 else "normal"
+                )
+                # Keyed by date, since longer horizons repeat weekday labels
+                st.button(f"🌤️ :blue[{day['weekday'][:3]}] 📈",
+                          key=f"day_{day['date']}",
+                          on_click=on_button_click,
+                          args=(day["date"],))
 
     st.write("")
-    st.subheader(f":blue[The] :rainbow[Golf-able Oracle] :blue[Has Made Prophecies :green[FORE!] The Above Days]")
-    
-    with col1:
-        st.metric(
-            label=six_days_date_list[0],
-            value=six_days_name_list[0][:3],
-            delta=0 if total_consecutive_hours_list[0] == 0 else total_consecutive_hours_list[0],
-            delta_color="off" if total_consecutive_hours_list[0] == 0 else "normal"
-        )
-        date_str = six_days_date_list[0]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        select_date = date_obj.date()
-        day_3_button = st.button(f"🌤️ :blue[{six_days_name_list[0][:3]}] 📈",
-                                on_click=on_button_click, 
-                                args=(data, select_date),)
-            
-    with col2:
-        st.metric(
-            label=six_days_date_list[1],
-            value=six_days_name_list[1][:3],
-            delta=0 if total_consecutive_hours_list[1] == 0 else total_consecutive_hours_list[1],
-            delta_color="off" if total_consecutive_hours_list[1] == 0 else "normal"
-        )
-        date_str = six_days_date_list[1]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        select_date = date_obj.date()
-        day_3_button = st.button(f"🌤️ :blue[{six_days_name_list[1][:3]}] 📈",
-                                on_click=on_button_click, 
-                                args=(data, select_date),)
-        
-    with col3:
-        st.metric(
-            label=six_days_date_list[2],
-            value=six_days_name_list[2][:3],
-            delta=0 if total_consecutive_hours_list[2] == 0 else total_consecutive_hours_list[2],
-            delta_color="off" if total_consecutive_hours_list[2] == 0 else "normal"
-        )
-        date_str = six_days_date_list[2]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        select_date = date_obj.date()
-        day_4_button = st.button(f"🌤️ :blue[{six_days_name_list[2][:3]}] 📈",
-                                on_click=on_button_click, 
-                                args=(data, select_date),)
-
-    with col4:
-        st.metric(
-            label=six_days_date_list[3],
-            value=six_days_name_list[3][:3],
-            delta=0 if total_consecutive_hours_list[3] == 0 else total_consecutive_hours_list[3],
-            delta_color="off" if total_consecutive_hours_list[3] == 0 else "normal"
-        )
-        date_str = six_days_date_list[3]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        select_date = date_obj.date()
-        day_5_button = st.button(f"🌤️ :blue[{six_days_name_list[3][:3]}] 📈",
-                                on_click=on_button_click, 
-                                args=(data, select_date),)
-
-    with col5:
-        st.metric(
-            label=six_days_date_list[4],
-            value=six_days_name_list[4][:3],
-            delta=0 if total_consecutive_hours_list[4] == 0 else total_consecutive_hours_list[4],
-            delta_color="off" if total_consecutive_hours_list[4] == 0 else "normal"
-        )
-        date_str = six_days_date_list[4]
-        date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-        select_date = date_obj.date()
-        day_6_button = st.button(f"🌤️ :blue[{six_days_name_list[4][:3]}] 📈",
-                                    on_click=on_button_click, 
-                                    args=(data, select_date),)
-
-def on_button_click(data, select_date):
-    get_data_for_select_date(data, select_date)
+    st.subheader(":blue[The] :rainbow[Golf-able Oracle] :blue[Has Made Prophecies :green[FORE!] The Above Days]")
+
+def on_button_click(select_date):
+    # The fragment rerun that follows renders this day from its prebuilt view
+    st.session_state.select_date = select_date
     
 
-def display_golf_forecast(data, date, min_temp, max_wind, max_rain, sunrise_time, sunset_time, filtered_forecast):
+def display_golf_forecast(day_view, city, min_temp, max_wind, max_rain, week_strip):
     
     # Greeting msg and tag line
     st.title(f"The :rainbow[Golf-able Oracle] Prophecy")
     st.subheader(f"{city}")
-    st.subheader(f"{date}")
+    st.subheader(f"{day_view['date']}")
     st.write("")
     st.write("")
     # Display golf forecast metrics and hourly weather data
     st.subheader(f"Weather Forecast Key Metrics") 
     st.write("")
     
-    # Extract daily forecast for the specified date
-    daily_forecast = next((item for item in data["data"]["timelines"][0]["intervals"] if item["startTime"].startswith(str(date))), None)
-    
-    if not daily_forecast:
-        st.error(f"No forecast data available for {date}")
-        return
-    
-    daily_high = daily_forecast["values"]["temperatureMax"]
-    daily_max_wind = daily_forecast["values"]["windSpeed"]
-    daily_max_precip = daily_forecast["values"]["precipitationProbability"]
+    daily_high = day_view["daily_high"]
+    daily_max_wind = day_view["daily_max_wind"]
+    daily_max_precip = day_view["daily_max_precip"]
 
     col1, col2, col3 = st.columns([1, 1, 1], gap='large')
 
-    temp_diff = daily_high - min_temp
-    wind_diff = daily_max_wind - max_wind
-    rain_diff = daily_max_precip - max_rain
+    temp_diff = day_view["temp_diff"]
+    wind_diff = day_view["wind_diff"]
+    rain_diff = day_view["rain_diff"]
 
     # Temperature Metric
     with col1:
@@ -489,50 +238,127 @@ def display_golf_forecast(data, date, min_temp, max_wind, max_rain, sunrise_time
     st.write("")
     st.write(f"### Hourly Forecast from Twilight to Dusk 🏌🏻‍♂️")
     st.write("")
-    
-    # Convert sunrise and sunset times to MST
-    utc = pytz.utc
-    mst = pytz.timezone('US/Mountain')
 
-    sunrise_dt_utc = dt.datetime.fromisoformat(sunrise_time[:-1])
-    sunset_dt_utc = dt.datetime.fromisoformat(sunset_time[:-1])
-    sunrise_dt_mst = utc.localize(sunrise_dt_utc).astimezone(mst)
-    sunset_dt_mst = utc.localize(sunset_dt_utc).astimezone(mst)
-
-    # Display sunrise and sunset times in MST
-    st.write(f"🌅 Twilight starts at: {sunrise_dt_mst.strftime('%I:%M %p')}")
-    st.write(f"🌇 Dusk ends at: {sunset_dt_mst.strftime('%I:%M %p')}")
+    # Display sunrise and sunset times in the course's local time
+    st.write(f"🌅 Twilight starts at: {day_view['sunrise'].strftime('%I:%M %p')}")
+    st.write(f"🌇 Dusk ends at: {day_view['sunset'].strftime('%I:%M %p')}")
 
     # Plot filtered forecast
-    graph_forecast_w_highlight(filtered_forecast, sunset_time, date, sunset_dt_mst, min_temp, max_wind, max_rain, 
-                               temp_diff, wind_diff, rain_diff)
+    graph_forecast_w_highlight(day_view, week_strip)
     
 
-def get_data_for_select_date(data, select_date=None):
+def load_forecast(city):
+    # Fetch and parse once per consultation; threshold edits and day buttons reuse the result.
+    # "denver", "Denver, CO" and "denver colorado" all resolve to one place, request and zone.
+    place = resolve_location(city)
+    data = get_weather_forecast(place["query"])
+    if not data:
+        return None
+
+    return parse_forecast(city, data, place["timezone"], get_forecast_store())
+
+def get_data_for_select_date(forecast, select_date, min_temp, max_wind, max_rain):
     # Use today's date if no date is provided
-    select_date = select_date or dt.date.today()
-
-    # Loop over each of the 5 days to display weather forecasts
-    for interval in data["data"]["timelines"][0]["intervals"]:
-        # Extract the date for the current forecast interval
-        forecast_date = dt.datetime.fromisoformat(interval["startTime"][:-1]).date()
-        
-        # Check if the forecast date matches the selected date
-        if forecast_date == select_date:
-            # Fetch sunrise and sunset times from this specific interval
-            sunrise_time = interval["values"]["sunriseTime"]
-            sunset_time = interval["values"]["sunsetTime"]
-            
-            # Filter the forecast for the current date
-            filtered_forecast = filter_forecast_by_sunrise_sunset(
-                data["data"]["timelines"][1]["intervals"], sunrise_time, sunset_time)
-            
-            # Call the function to display the forecast
-            display_golf_forecast(
-                data, forecast_date, min_temp, max_wind, max_rain, sunrise_time, sunset_time, 
-                filtered_forecast)
-
-            return select_date, city
+    select_date = select_date or local_today(forecast["timezone"])
+
+    # Built once per forecast and thresholds; switching days is a dictionary lookup
+    day_views = build_day_views(forecast, min_temp, max_wind, max_rain)
+    day_view = day_views["days"].get(select_date)
+
+    if day_view is None:
+        st.error(f"No forecast data available for {select_date}")
+        return
+
+    display_golf_forecast(day_view, forecast["city"], min_temp, max_wind, max_rain, day_views["week_strip"])
+    display_tee_times(day_views["tee_time_rows"])
+
+    return select_date, forecast["city"]
+
+@st.fragment
+def forecast_section(forecast, min_temp, max_wind, max_rain):
+    # The day buttons live inside this fragment, so a day switch reruns only this section
+    get_data_for_select_date(forecast, st.session_state.select_date, min_temp, max_wind, max_rain)
+
+def display_tee_times(tee_time_rows):
+    # Best rounds of the horizon, scored by how comfortably every hour clears the thresholds
+    if not tee_time_rows:
+        return
+
+    st.write("")
+    st.subheader(f":green[Best {TEE_TIME_HOURS}Hr Tee Times]")
+    st.dataframe(tee_time_rows, hide_index=True, use_container_width=True)
+
+def display_course_rankings(cities, min_temp, max_wind, max_rain):
+    st.title(f"The :rainbow[Golf-able Oracle] Course Rankings")
+    st.write("")
+
+    resolution, horizon_days = get_forecast_settings()
+    ranking_df, failed = rank_courses(get_prefetch_scheduler(), get_tomorrowio_client(), cities, min_temp, max_wind, max_rain,
+                                      resolution=resolution, horizon_days=horizon_days, store=get_forecast_store(),
+                                      archive=get_forecast_archive())
+
+    for city in failed:
+        st.error(f"Failed to fetch weather data for {city}")
+
+    if ranking_df.empty:
+        return
+
+    st.subheader(f":green[Golf-able Hours per Course & Day]")
+    st.dataframe(ranking_df, use_container_width=True)
+
+    best_course = ranking_df.index[0]
+    st.subheader(f":green[The] :rainbow[Golf-able Oracle] :green[Favors] :blue[{best_course}] "
+                 f":green[With] :blue[{ranking_df['Total'].iloc[0]}Hr] :green[of Golf-ability]")
+
+    tee_times = rank_tee_times(get_prefetch_scheduler(), get_tomorrowio_client(), list(ranking_df.index),
+                               min_temp, max_wind, max_rain, resolution=resolution,
+                               horizon_days=horizon_days, store=get_forecast_store())
+    display_tee_times(tee_time_rows(tee_times))
+
+
+def display_debug_panel():
+    metrics_snapshot = oracle_metrics.snapshot()
+
+    st.sidebar.header(":orange[Debug Panel]")
+
+    if metrics_snapshot["stages"]:
+        stages_df = pd.DataFrame.from_dict(metrics_snapshot["stages"], orient="index")
+        stages_df = (stages_df[["count", "last_s", "mean_s", "max_s"]] * [1, 1000, 1000, 1000]).round(2)
+        stages_df.columns = ["Count", "Last ms", "Mean ms", "Max ms"]
+        st.sidebar.dataframe(stages_df, use_container_width=True)
+    else:
+        st.sidebar.write("No stages timed yet")
+
+    counters = metrics_snapshot["counters"]
+    st.sidebar.write(
+        f"API calls: {counters.get('api_calls', 0)} · "
+        f"Cache hits: {counters.get('cache_hits', 0)} · "
+        f"Cache misses: {counters.get('cache_misses', 0)} · "
+        f"Payload: {counters.get('payload_bytes', 0) / 1024:.1f} KiB"
+    )
+
+    store_stats = get_forecast_store().stats()
+    st.sidebar.write(
+        f"Shared forecasts: {store_stats['forecasts']} · "
+        f"{store_stats['bytes'] / 1024:.1f} KiB · "
+        f"Store hits: {store_stats['hits']} · "
+        f"Evictions: {store_stats['evictions']}"
+    )
+
+    prefetch_stats = get_prefetch_scheduler().stats()
+    st.sidebar.write(
+        f"Tracked courses: {prefetch_stats['tracked']} · "
+        f"Prefetches: {prefetch_stats['prefetches']} ({prefetch_stats['prefetches_last_hour']} this hour) · "
+        f"Stale served: {prefetch_stats['stale_served']} · "
+        f"Revalidations: {prefetch_stats['revalidations']}"
+    )
+
+    prometheus_text = oracle_metrics.prometheus_text()
+    st.sidebar.download_button("Download Prometheus snapshot", prometheus_text,
+                               file_name="oracle_metrics.prom", mime="text/plain")
+    with st.sidebar.expander("Prometheus snapshot"):
+        st.code(prometheus_text, language="text")
+
 
 ####### Initial Streamlit page configuration #######
     
@@ -561,6 +387,19 @@ st.sidebar.header(":blue[You may be permitted to]")
 st.sidebar.write("")
 
 golf_oracle_button = st.sidebar.button("⛳ :rainbow[Consult the Golf-able Oracle] 🧙‍♂️")
+
+st.sidebar.write("")
+st.sidebar.header(":green[Multi-Course Locations]")
+courses_text = st.sidebar.text_area("One location per line", value="")
+rank_courses_button = st.sidebar.button("🏆 :rainbow[Rank the Courses]")
+
+st.sidebar.write("")
+debug_panel = st.sidebar.checkbox("🔧 Show debug panel", value=oracle_metrics.ENV_ENABLED)
+# Timing spans are collected process-wide while any session has the panel open; each session
+# registers under its own id, so closing the panel in one session leaves the others collecting
+if "metrics_viewer" not in st.session_state:
+    st.session_state.metrics_viewer = uuid.uuid4().hex
+oracle_metrics.set_viewing(st.session_state.metrics_viewer, debug_panel)
     
 # CSS to center the elements
 st.markdown(
@@ -611,9 +450,42 @@ if golf_oracle_button:
     welcome_content5.empty()
     welcome_content6.empty()
     
-    data = get_weather_forecast(city)
-    
-    if data:
-        # Loop over each of the 5 days to display weather forecasts
-        # Call the function for today's date
-        get_data_for_select_date(data)
+    forecast = load_forecast(city)
+
+    st.session_state.mode = "oracle"
+    st.session_state.forecast = forecast
+    st.session_state.select_date = None
+
+# Rank several courses in one consultation
+if rank_courses_button:
+    st.session_state.content_visible = False
+    welcome_content1.empty()
+    welcome_content2.empty()
+    welcome_content3.empty()
+    welcome_content4.empty()
+    welcome_content5.empty()
+    welcome_content6.empty()
+
+    # Drop blank lines and repeats of the same course
+    courses = {}
+    for line in courses_text.splitlines():
+        if line.strip():
+            courses.setdefault(resolve_location(line)["query"], line.strip())
+
+    st.session_state.mode = "rank"
+    st.session_state.courses = list(courses.values())
+
+# Every rerun, including sidebar threshold edits, re-renders the last consultation
+if st.session_state.get("mode") == "oracle" and st.session_state.forecast:
+    # Render the selected date, today by default
+    forecast_section(st.session_state.forecast, min_temp, max_wind, max_rain)
+
+elif st.session_state.get("mode") == "rank":
+    if st.session_state.courses:
+        display_course_rankings(st.session_state.courses, min_temp, max_wind, max_rain)
+    else:
+        st.error("Enter at least one course location to rank")
+
+# Shown last so it includes the spans of this rerun
+if debug_panel:
+    display_debug_panel()